@@ -8,6 +8,7 @@ import AdminPanel from './components/AdminPanel.jsx'
 import Reports from './components/Reports.jsx'
 import ActivationForm from './components/ActivationForm.jsx'
 import InteractiveFeatures from './components/InteractiveFeatures.jsx'
+import { onTokenRefresh } from './lib/auth-fetch.js'
 import { 
   Mountain, 
   Users, 
@@ -46,6 +47,16 @@ function App() {
     }
   }, [])
 
+  // Keep the token in state current after auth-fetch refreshes it
+  useEffect(() => onTokenRefresh((newToken) => {
+    setToken(newToken)
+    if (!newToken) {
+      localStorage.removeItem('user')
+      setUser(null)
+      setShowAdmin(false)
+    }
+  }), [])
+
   const handleActivationSuccess = (activatedUser) => {
     setShowActivation(false)
     setShowLogin(true)
@@ -104,7 +115,15 @@ function App() {
   }
 
   const handleLogout = () => {
+    const currentToken = localStorage.getItem('token')
+    if (currentToken) {
+      fetch('http://localhost:5000/api/auth/logout', {
+        method: 'POST',
+        headers: { 'Authorization': `Bearer ${currentToken}` }
+      }).catch(() => {})
+    }
     localStorage.removeItem('token')
+    localStorage.removeItem('refresh_token')
     localStorage.removeItem('user')
     setUser(null)
     setToken(null)
@@ -0,0 +1,66 @@
+"""Micro-benchmarks for model serialization, hot queries and the auth flow.
+
+Run explicitly (the file is not collected by a plain ``pytest`` run):
+
+    python -m pytest benchmarks/bench_models.py --benchmark-json=benchmarks/results/micro.json
+"""
+import itertools
+from datetime import date
+from src.database import db
+from src.models.user import User, Report, ReportFact
+from src.models.activation import ActivationCode, UserActivation, Notification
+from src.models.settings import Participant
+from src.serialization import serialize, dumps
+from src import budget
+
+def test_reports_to_dict(benchmark, app_context):
+    reports = Report.query.limit(1000).all()
+    benchmark(lambda: [report.to_dict() for report in reports])
+
+def test_reports_serializer(benchmark, app_context):
+    reports = Report.query.limit(1000).all()
+    benchmark(lambda: dumps(serialize(reports)))
+
+def test_participants_serializer(benchmark, app_context):
+    participants = Participant.query.limit(1000).all()
+    benchmark(lambda: dumps(serialize(participants)))
+
+def test_list_active_reports(benchmark, app_context):
+    def query():
+        db.session.expunge_all()
+        return Report.query.filter_by(is_active=True).order_by(Report.created_at.desc()).limit(50).all()
+    benchmark(query)
+
+def test_unread_notifications(benchmark, app_context):
+    def query():
+        db.session.expunge_all()
+        return (Notification.query.filter_by(user_id=2, is_read=False)
+                .order_by(Notification.created_at.desc()).limit(20).all())
+    benchmark(query)
+
+def test_budget_facts_filter(benchmark, app_context):
+    def query():
+        return (ReportFact.query
+                .filter(ReportFact.type == 'budget', ReportFact.is_active == True,
+                        ReportFact.due_date.between(date(2024, 1, 1), date(2024, 12, 31)))
+                .count())
+    benchmark(query)
+
+def test_budget_rollups_by_category(benchmark, app_context):
+    benchmark(lambda: budget.query_rollups(month_from='2024-01', month_to='2024-12', group_by=('category',)))
+
+def test_check_password(benchmark, app_context):
+    user = User.query.filter_by(username='user1').one()
+    benchmark(user.check_password, 'password')
+
+def test_activation_use_code(benchmark, app_context):
+    code = ActivationCode.query.filter_by(code='BENCHCODE').one()
+    user_ids = itertools.count(10**6)
+
+    def use_code():
+        ok, message = code.use_code(next(user_ids))
+        assert ok, message
+
+    benchmark(use_code)
+    UserActivation.query.delete()
+    db.session.commit()
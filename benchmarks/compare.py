@@ -0,0 +1,60 @@
+"""Compare two benchmark result files and flag regressions.
+
+Accepts pytest-benchmark JSON (--benchmark-json) and load-test summaries
+written by locustfile.py:
+
+    python benchmarks/compare.py results/before.json results/after.json --threshold 10
+
+Exits with status 1 if any benchmark got slower by more than the threshold.
+"""
+import sys
+import json
+import argparse
+
+def load(path):
+    """Map benchmark name -> time in milliseconds"""
+    with open(path) as f:
+        data = json.load(f)
+
+    if data.get('type') == 'load':
+        return {name: result['median_ms'] for name, result in data['results'].items() if result['requests']}
+    return {bench['name']: bench['stats']['median'] * 1000 for bench in data.get('benchmarks', [])}
+
+def compare(before, after, threshold):
+    regressions = []
+    rows = []
+    for name in sorted(set(before) | set(after)):
+        old, new = before.get(name), after.get(name)
+        if old is None or new is None:
+            rows.append((name, old, new, None))
+            continue
+        change = (new - old) / old * 100 if old else 0.0
+        rows.append((name, old, new, change))
+        if change > threshold:
+            regressions.append(name)
+    return rows, regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare two benchmark result files')
+    parser.add_argument('before')
+    parser.add_argument('after')
+    parser.add_argument('--threshold', type=float, default=10.0, help='allowed slowdown in percent')
+    args = parser.parse_args()
+
+    rows, regressions = compare(load(args.before), load(args.after), args.threshold)
+
+    width = max([len(row[0]) for row in rows] + [9])
+    print(f'{"benchmark":<{width}}  {"before":>12}  {"after":>12}  {"change":>8}')
+    for name, old, new, change in rows:
+        old_text = f'{old:.3f}ms' if old is not None else '-'
+        new_text = f'{new:.3f}ms' if new is not None else '-'
+        change_text = f'{change:+.1f}%' if change is not None else 'n/a'
+        marker = '  <-- regression' if name in regressions else ''
+        print(f'{name:<{width}}  {old_text:>12}  {new_text:>12}  {change_text:>8}{marker}')
+
+    if regressions:
+        print(f'\n{len(regressions)} benchmark(s) slower than {args.threshold:g}%')
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
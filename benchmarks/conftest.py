@@ -0,0 +1,34 @@
+"""Fixtures for the pytest-benchmark micro-benchmarks and the backend tests.
+
+    python -m pytest benchmarks/bench_models.py --benchmark-json=benchmarks/results/micro-$(date +%Y%m%d).json
+    python -m pytest benchmarks [--database sqlite --database postgresql://...]
+
+BENCH_SCALE sets the number of seeded reports (default 10000). Tests that
+take a database_url run once per --database ("sqlite", the default, is a
+temporary SQLite file).
+"""
+import os
+import pytest
+from seed import make_app, seed
+
+def pytest_addoption(parser):
+    parser.addoption('--database', action='append', default=[],
+                     help='database URL to run the portability tests against ("sqlite" for a temporary file)')
+
+def pytest_generate_tests(metafunc):
+    if 'database_url' in metafunc.fixturenames:
+        urls = list(dict.fromkeys(metafunc.config.getoption('database'))) or ['sqlite']
+        metafunc.parametrize('database_url', urls, scope='module')
+
+@pytest.fixture(scope='session')
+def bench_app(tmp_path_factory):
+    database = tmp_path_factory.mktemp('bench') / 'bench.db'
+    app = make_app(f'sqlite:///{database}')
+    with app.app_context():
+        seed(int(os.environ.get('BENCH_SCALE', 10000)))
+    return app
+
+@pytest.fixture
+def app_context(bench_app):
+    with bench_app.app_context():
+        yield bench_app
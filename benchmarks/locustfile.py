@@ -0,0 +1,105 @@
+"""HTTP load scenario for the Flask API.
+
+Seed a database with benchmarks/seed.py, point the app at it and start it,
+then run for example:
+
+    locust -f benchmarks/locustfile.py --host http://localhost:5000 \
+        --headless -u 50 -r 10 -t 2m
+
+Each simulated user logs in as a random seeded user and mixes notification
+polling, report listing, exports and share-link access. A JSON summary is
+written to benchmarks/results/ when the run ends, for benchmarks/compare.py.
+"""
+import os
+import json
+import time
+import random
+from locust import HttpUser, task, between, events
+
+SEEDED_USERS = int(os.environ.get('LOAD_USERS', 100))
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+class ScoutUser(HttpUser):
+    wait_time = between(0.5, 2)
+
+    def on_start(self):
+        self.login()
+        self.share_token = None
+
+    def login(self):
+        if random.random() < 0.2:
+            credentials = {'username': 'admin', 'password': 'admin123'}
+        else:
+            credentials = {'username': f'user{random.randint(1, SEEDED_USERS - 1)}', 'password': 'password'}
+        response = self.client.post('/api/auth/login', json=credentials, name='/api/auth/login')
+        token = response.json().get('access_token') if response.ok else None
+        self.headers = {'Authorization': f'Bearer {token}'} if token else {}
+        self.is_leader = response.ok and response.json()['user']['role'] in ('leader', 'full_editor', 'admin')
+
+    @task(10)
+    def poll_notifications(self):
+        self.client.get('/api/notifications', headers=self.headers, name='/api/notifications')
+
+    @task(5)
+    def list_reports(self):
+        report_type = random.choice(('budget', 'issues', 'schedule'))
+        self.client.get(f'/api/reports/{report_type}', headers=self.headers, name='/api/reports/[type]')
+
+    @task(2)
+    def search_budget(self):
+        year = random.choice((2023, 2024, 2025))
+        self.client.get(f'/api/reports/budget/rollups?from={year}-01&to={year}-12&group_by=category',
+                        headers=self.headers, name='/api/reports/budget/rollups')
+
+    @task(1)
+    def export_reports(self):
+        if not self.is_leader:
+            return
+        response = self.client.post('/api/reports/export', json={'format': random.choice(('json', 'csv'))},
+                                    headers=self.headers, name='/api/reports/export')
+        if not response.ok:
+            return
+        status_url = response.json()['status_url']
+        for _ in range(30):
+            job = self.client.get(status_url, headers=self.headers, name='/api/jobs/[id]').json()
+            if job.get('status') not in ('queued', 'running'):
+                break
+            time.sleep(1)
+        if job.get('download_url'):
+            self.client.get(job['download_url'], headers=self.headers, name='/api/jobs/[id]/download')
+
+    @task(3)
+    def access_share_link(self):
+        if self.share_token is None:
+            if not self.is_leader:
+                return
+            response = self.client.post(f'/api/reports/{random.randint(1, 1000)}/share',
+                                        json={'expires_in_hours': 1, 'max_access': 10**6},
+                                        headers=self.headers, name='/api/reports/[id]/share')
+            if not response.ok:
+                return
+            self.share_token = response.json()['share_token']
+        self.client.get(f'/api/shared/{self.share_token}', name='/api/shared/[token]')
+
+    @task(1)
+    def relogin(self):
+        self.login()
+
+@events.quitting.add_listener
+def save_results(environment, **kwargs):
+    """Write per-endpoint latency and throughput as JSON"""
+    results = {}
+    for (name, method), entry in environment.stats.entries.items():
+        results[f'{method} {name}'] = {
+            'requests': entry.num_requests,
+            'failures': entry.num_failures,
+            'median_ms': entry.median_response_time,
+            'p95_ms': entry.get_response_time_percentile(0.95),
+            'mean_ms': entry.avg_response_time,
+            'rps': entry.total_rps
+        }
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f'load-{time.strftime("%Y%m%d_%H%M%S")}.json')
+    with open(path, 'w') as f:
+        json.dump({'type': 'load', 'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'), 'results': results}, f, indent=2)
+    print(f'Load test results written to {path}')
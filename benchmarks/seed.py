@@ -0,0 +1,248 @@
+"""Synthetic data generator for benchmarks and load tests.
+
+Seeds users, reports, comments, notifications, participants, activities and
+attendance at a configurable scale. ``scale`` is the number of reports;
+the other tables are sized relative to it. Rows are bulk-inserted in
+batches so 1M-row databases build in minutes, and the generator is seeded
+so every run produces the same data.
+
+    python benchmarks/seed.py --scale 100000 --database sqlite:////tmp/bench.db
+
+Every seeded user has the password ``password``; the admin is admin/admin123.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+from datetime import datetime, date, time as day_time, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import text
+from werkzeug.security import generate_password_hash
+from src.database import db
+from src.models.user import User, Report, ReportFact
+from src.models.activation import ActivationCode, Comment, Notification
+from src.models.settings import Participant, Activity, Attendance
+from src.models.job import Job  # imported so create_all() builds every table
+from src.models.budget import BudgetLine, BudgetRollup
+from src.models.schedule import ActivitySlot
+from src import budget, scheduling
+
+PASSWORD = 'password'
+ROLES = ['member'] * 6 + ['leader'] * 3 + ['full_editor']
+FIRST_NAMES = ['محمد', 'أحمد', 'عبدالله', 'خالد', 'سعد', 'فهد', 'عمر', 'يوسف', 'ناصر', 'سلطان']
+LAST_NAMES = ['العتيبي', 'القحطاني', 'الشهري', 'الغامدي', 'الزهراني', 'الدوسري', 'المطيري', 'الحربي']
+CATEGORIES = ['معدات التخييم', 'النقل والمواصلات', 'الطعام والمؤن', 'الأنشطة والفعاليات', 'الطوارئ']
+LOCATIONS = ['جبال السروات', 'المركز الكشفي', 'وادي حنيفة', 'شاطئ نصف القمر', 'روضة خريم']
+ISSUE_STATUSES = ['جديدة', 'قيد المعالجة', 'حل']
+SCHEDULE_STATUSES = ['مخططة', 'مؤكدة']
+
+def make_app(database_uri):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+def table_sizes(scale):
+    return {
+        'users': max(10, scale // 100),
+        'reports': scale,
+        'comments': scale,
+        'notifications': scale,
+        'participants': max(10, scale // 2),
+        'activities': max(10, scale // 20),
+        'attendance': scale
+    }
+
+def insert_batches(model, rows, batch_size):
+    """Bulk insert an iterator of row dicts, committing each batch"""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            db.session.execute(model.__table__.insert(), batch)
+            db.session.commit()
+            batch = []
+    if batch:
+        db.session.execute(model.__table__.insert(), batch)
+        db.session.commit()
+
+def reset_sequences(*models):
+    """Explicit ids bypass PostgreSQL sequences; move them past the seeded rows"""
+    if db.engine.dialect.name != 'postgresql':
+        return
+    for model in models:
+        table = model.__tablename__
+        db.session.execute(text(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                                f"COALESCE(MAX(id), 0) + 1, false) FROM {table}"))
+    db.session.commit()
+
+def name(rng):
+    return f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'
+
+def report_rows(rng, count, user_count, start):
+    for i in range(count):
+        report_type = rng.choice(('budget', 'issue', 'schedule'))
+        day = start + timedelta(days=rng.randrange(3 * 365))
+        if report_type == 'budget':
+            categories = [{'name': category, 'budget': rng.randrange(1000, 20000, 500), 'spent': rng.randrange(0, 15000, 250)}
+                          for category in rng.sample(CATEGORIES, rng.randint(1, len(CATEGORIES)))]
+            data = {'date': day.isoformat(), 'categories': categories,
+                    'totalBudget': sum(c['budget'] for c in categories),
+                    'spent': sum(c['spent'] for c in categories)}
+        elif report_type == 'issue':
+            data = {'date': day.isoformat(), 'status': rng.choice(ISSUE_STATUSES), 'priority': rng.choice(('عالية', 'متوسطة', 'منخفضة'))}
+        else:
+            data = {'date': day.isoformat(), 'time': '08:00', 'location': rng.choice(LOCATIONS),
+                    'participants': rng.randint(5, 40), 'status': rng.choice(SCHEDULE_STATUSES)}
+        created_at = datetime.combine(day, day_time(rng.randrange(24), rng.randrange(60)))
+        yield {
+            'id': i + 1,
+            'type': report_type,
+            'title': f'تقرير رقم {i + 1}',
+            'content': 'تفاصيل التقرير ' * rng.randint(3, 30),
+            'data': data,
+            'created_by': rng.randint(1, user_count),
+            'created_at': created_at,
+            'updated_at': created_at,
+            'is_active': rng.random() > 0.05
+        }
+
+def attendance_pairs(rng, sizes):
+    """Distinct (activity, participant) pairs: a participant attends an activity once"""
+    count = min(sizes['attendance'], sizes['activities'] * sizes['participants'])
+    seen = set()
+    while len(seen) < count:
+        pair = (rng.randint(1, sizes['activities']), rng.randint(1, sizes['participants']))
+        if pair not in seen:
+            seen.add(pair)
+            yield pair
+
+def seed(scale=1000, batch_size=5000, random_seed=42, verbose=False):
+    """Create the schema and fill it; returns the number of rows per table"""
+    rng = random.Random(random_seed)
+    sizes = table_sizes(scale)
+    start = date(2023, 1, 1)
+    now = datetime(2025, 12, 31)
+    started = time.perf_counter()
+
+    def log(message):
+        if verbose:
+            print(f'[{time.perf_counter() - started:7.1f}s] {message}')
+
+    db.drop_all()
+    db.create_all()
+
+    # Hashing is deliberately slow, so every seeded user shares one hash
+    password_hash = generate_password_hash(PASSWORD)
+    admin_hash = generate_password_hash('admin123')
+    insert_batches(User, ({
+        'id': i + 1,
+        'username': 'admin' if i == 0 else f'user{i}',
+        'email': f'user{i}@scoutteam.sa',
+        'password_hash': admin_hash if i == 0 else password_hash,
+        'role': 'admin' if i == 0 else rng.choice(ROLES),
+        'full_name': name(rng),
+        'phone': f'+9665{rng.randrange(10**8):08d}',
+        'created_at': now,
+        'is_active': True,
+        'is_activated': True
+    } for i in range(sizes['users'])), batch_size)
+    log(f"{sizes['users']} users")
+
+    db.session.add(ActivationCode(code='BENCHCODE', description='benchmark', max_uses=10**9, created_by=1))
+    db.session.commit()
+
+    insert_batches(Report, report_rows(rng, sizes['reports'], sizes['users'], start), batch_size)
+    reset_sequences(User, Report)
+    log(f"{sizes['reports']} reports")
+
+    insert_batches(Comment, ({
+        'content': 'تعليق على التقرير ' * rng.randint(1, 5),
+        'report_id': rng.randint(1, sizes['reports']),
+        'user_id': rng.randint(1, sizes['users']),
+        'likes_count': rng.randrange(10),
+        'is_active': True,
+        'created_at': now,
+        'updated_at': now
+    } for _ in range(sizes['comments'])), batch_size)
+    log(f"{sizes['comments']} comments")
+
+    insert_batches(Notification, ({
+        'user_id': rng.randint(1, sizes['users']),
+        'title': 'تعليق جديد',
+        'message': 'تم إضافة تعليق على تقريرك',
+        'type': rng.choice(('comment', 'like', 'report', 'system')),
+        'related_id': rng.randint(1, sizes['reports']),
+        'is_read': rng.random() < 0.7,
+        'created_at': (created_at := now - timedelta(minutes=rng.randrange(500000))),
+        'updated_at': created_at
+    } for _ in range(sizes['notifications'])), batch_size)
+    log(f"{sizes['notifications']} notifications")
+
+    insert_batches(Participant, ({
+        'name': name(rng),
+        'email': f'scout{i}@example.com',
+        'phone': f'+9665{rng.randrange(10**8):08d}',
+        'age': rng.randint(8, 18),
+        'join_date': start + timedelta(days=rng.randrange(1000)),
+        'status': 'active' if rng.random() > 0.1 else 'inactive',
+        'role': rng.choice(('scout', 'scout', 'scout', 'assistant', 'leader')),
+        'emergency_contact': name(rng),
+        'emergency_phone': f'+9665{rng.randrange(10**8):08d}',
+        'medical_info': rng.choice((None, 'ربو', 'حساسية من الفول السوداني')),
+        'created_at': now,
+        'updated_at': now,
+        'created_by': 1
+    } for i in range(sizes['participants'])), batch_size)
+    log(f"{sizes['participants']} participants")
+
+    insert_batches(Activity, ({
+        'title': f'نشاط رقم {i + 1}',
+        'description': 'وصف النشاط',
+        'date': start + timedelta(days=rng.randrange(3 * 365)),
+        'time': day_time(rng.choice((7, 8, 16, 17))),
+        'location': rng.choice(LOCATIONS),
+        'max_participants': rng.choice((None, 20, 30, 50)),
+        'status': rng.choice(('planned', 'completed', 'cancelled')),
+        'created_at': now,
+        'updated_at': now,
+        'created_by': 1
+    } for i in range(sizes['activities'])), batch_size)
+    log(f"{sizes['activities']} activities")
+
+    insert_batches(Attendance, ({
+        'activity_id': activity_id,
+        'participant_id': participant_id,
+        'status': rng.choice(('present', 'present', 'present', 'absent', 'late', 'excused')),
+        'recorded_at': now,
+        'recorded_by': 1
+    } for activity_id, participant_id in attendance_pairs(rng, sizes)), batch_size)
+    log(f"{sizes['attendance']} attendance records")
+
+    # Bulk inserts bypass the ORM events, so build the derived tables explicitly
+    ReportFact.rebuild()
+    budget.rebuild()
+    scheduling.rebuild()
+    log('report facts, budget rollups and activity slots')
+    return sizes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', type=int, default=1000, help='number of reports (1k to 1M)')
+    parser.add_argument('--database', default=f"sqlite:///{os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench.db')}")
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    app = make_app(args.database)
+    with app.app_context():
+        sizes = seed(args.scale, args.batch_size, args.seed, verbose=True)
+    print(', '.join(f'{count} {table}' for table, count in sizes.items()))
+
+if __name__ == '__main__':
+    main()
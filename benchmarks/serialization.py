@@ -0,0 +1,46 @@
+"""Micro-benchmark: to_dict + stdlib json vs generated serializers + fast encoder.
+
+Seeds an in-memory SQLite database with 10k reports (and matching comments,
+notifications and participants) and times serializing each full list, the
+way the list endpoints return it.
+
+    python benchmarks/serialization.py [rows]
+"""
+import os
+import sys
+import json
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.models.user import Report
+from src.models.activation import Comment, Notification
+from src.models.settings import Participant
+from src.serialization import serialize, dumps, orjson
+from seed import make_app, seed
+
+def best_of(fn, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+def main(rows):
+    app = make_app('sqlite://')
+
+    with app.app_context():
+        seed(rows)
+
+        print(f'{rows} reports, encoder: {"orjson" if orjson else "json"}')
+        print(f'{"model":<14}{"to_dict+json":>16}{"serializer":>14}{"speedup":>10}{"bytes old":>12}{"bytes new":>12}')
+        for model in (Report, Comment, Notification, Participant):
+            objects = model.query.all()
+            old_time, old_body = best_of(lambda: json.dumps([o.to_dict() for o in objects]).encode('utf-8'))
+            new_time, new_body = best_of(lambda: dumps(serialize(objects)))
+            print(f'{model.__name__:<14}{old_time * 1000:>14.1f}ms{new_time * 1000:>12.1f}ms'
+                  f'{old_time / new_time:>9.1f}x{len(old_body):>12}{len(new_body):>12}')
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,105 @@
+"""Import-time budget for "import src.main".
+
+Starts fresh interpreters with ``python -X importtime`` against a throwaway
+database. A warm-up run creates and stamps the schema, so the measured runs
+are ordinary warm starts. The best of IMPORT_RUNS (default 3) is compared
+with the budget. The tests fail when:
+
+- src.main takes longer than IMPORT_BUDGET_MS (default 1000) to import
+- a module that should only load on first use (DEFERRED) was imported at startup
+- a route module in src.startup.BLUEPRINTS cannot be imported and registered
+
+    python -m pytest benchmarks/test_importtime.py
+    python benchmarks/test_importtime.py [--top 15]   # list the slowest modules
+"""
+import os
+import sys
+import argparse
+import subprocess
+import tempfile
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Prefixes of modules that must not be imported by "import src.main"
+DEFERRED = (
+    'src.routes.',                      # registered before the first request (src/startup.py)
+    'src.exports', 'src.participant_import', 'src.tasks', 'src.jobs', 'src.mail',
+    'openpyxl', 'cProfile',
+    'sqlalchemy.dialects.postgresql',   # only loaded for a PostgreSQL DATABASE_URL
+)
+
+def make_env(directory):
+    env = dict(os.environ,
+               DATABASE_URL=f"sqlite:///{os.path.join(directory, 'app.db')}",
+               ARCHIVE_DATABASE_URI=f"sqlite:///{os.path.join(directory, 'archive.db')}",
+               TENANT_DATABASE_DIR=os.path.join(directory, 'tenants'),
+               JOBS_ARTIFACT_DIR=os.path.join(directory, 'jobs'),
+               AUDIT_LOG_DIR=os.path.join(directory, 'audit'))
+    env.pop('DATABASE_REPLICA_URLS', None)
+    env.pop('TENANT_REGISTRY_URI', None)
+    return env
+
+def run(env, code, *options):
+    result = subprocess.run([sys.executable, *options, '-c', code],
+                            cwd=ROOT, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f'{code!r} failed:\n{result.stderr[-2000:]}')
+    return result
+
+def measure(env):
+    """{module: (self us, cumulative us)} for one fresh "import src.main" """
+    modules = {}
+    for line in run(env, 'import src.main', '-X', 'importtime').stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+def best_of(env, runs):
+    measure(env)  # warm-up: creates and stamps the schema
+    return min((measure(env) for _ in range(max(1, runs))), key=lambda modules: modules['src.main'][1])
+
+@pytest.fixture(scope='module')
+def import_env(tmp_path_factory):
+    return make_env(str(tmp_path_factory.mktemp('importtime')))
+
+@pytest.fixture(scope='module')
+def import_times(import_env):
+    return best_of(import_env, int(os.environ.get('IMPORT_RUNS', 3)))
+
+def test_import_within_budget(import_times):
+    budget_ms = float(os.environ.get('IMPORT_BUDGET_MS', 1000))
+    total_ms = import_times['src.main'][1] / 1000
+    assert total_ms <= budget_ms, f'import src.main took {total_ms:.0f} ms (budget {budget_ms:.0f} ms)'
+
+def test_deferred_modules_not_imported(import_times):
+    eager = sorted(name for name in import_times if name.startswith(DEFERRED))
+    assert not eager, 'imported at startup but should be deferred: ' + ', '.join(eager)
+
+def test_blueprints_load(import_env):
+    # Every BLUEPRINTS entry imports and registers, once, on the first load
+    result = run(import_env, 'import src.main\n'
+                             'from src.startup import load_blueprints\n'
+                             'load_blueprints(src.main.app)\n'
+                             'load_blueprints(src.main.app)\n'
+                             'print(",".join(sorted(src.main.app.blueprints)))')
+    from src.startup import BLUEPRINTS
+    names = [attribute[:-len('_bp')] for _, attribute, _ in BLUEPRINTS]
+    assert result.stdout.split() == [','.join(sorted(names))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=int(os.environ.get('IMPORT_RUNS', 3)))
+    parser.add_argument('--top', type=int, default=15, help='slowest modules to list')
+    args = parser.parse_args()
+
+    best = best_of(make_env(tempfile.mkdtemp(prefix='importtime-')), args.runs)
+    print(f'import src.main: {best["src.main"][1] / 1000:.0f} ms (best of {max(1, args.runs)})')
+    print('slowest modules by self time:')
+    for name, (self_us, cumulative_us) in sorted(best.items(), key=lambda item: -item[1][0])[:args.top]:
+        print(f'  {self_us / 1000:8.1f} ms  {cumulative_us / 1000:8.1f} ms  {name}')
+
+if __name__ == '__main__':
+    main()
@@ -22,6 +22,9 @@ import {
   ExternalLink
 } from 'lucide-react';
 
+// Seconds to wait for an export job before giving up
+const EXPORT_POLL_ATTEMPTS = 120;
+
 const DataSharing = ({ token, reports = [], participants = [] }) => {
   const [shareLinks, setShareLinks] = useState([]);
   const [loading, setLoading] = useState(false);
@@ -113,7 +116,35 @@ const DataSharing = ({ token, reports = [], participants = [] }) => {
       });
 
       if (response.ok) {
-        const blob = await response.blob();
+        // Exports run as background jobs: poll until the file is ready, then download it
+        // (give up after EXPORT_POLL_ATTEMPTS seconds, e.g. when no worker is running)
+        const { job_id } = await response.json();
+        let job = null;
+        let attempts = 0;
+        do {
+          await new Promise((resolve) => setTimeout(resolve, 1000));
+          const statusResponse = await fetch(`/api/jobs/${job_id}`, {
+            headers: { 'Authorization': `Bearer ${token}` }
+          });
+          job = await statusResponse.json();
+          attempts += 1;
+        } while ((job.status === 'queued' || job.status === 'running') && attempts < EXPORT_POLL_ATTEMPTS);
+
+        if (job.status === 'queued' || job.status === 'running') {
+          setMessage('لم يكتمل التصدير بعد، يرجى المحاولة لاحقاً');
+          setLoading(false);
+          return;
+        }
+        if (job.status !== 'succeeded') {
+          setMessage(job.error ? `فشل التصدير: ${job.error}` : 'حدث خطأ في التصدير');
+          setLoading(false);
+          return;
+        }
+
+        const fileResponse = await fetch(job.download_url, {
+          headers: { 'Authorization': `Bearer ${token}` }
+        });
+        const blob = await fileResponse.blob();
         const url = window.URL.createObjectURL(blob);
         const a = document.createElement('a');
         a.style.display = 'none';
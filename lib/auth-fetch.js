@@ -0,0 +1,61 @@
+// Access tokens are short-lived: when an API call comes back 401, exchange the
+// stored refresh token for a new pair once and retry with the new access token.
+// Components holding the token in state subscribe with onTokenRefresh so later
+// calls use the new token instead of refreshing again.
+const REFRESH_URL = 'http://localhost:5000/api/auth/refresh'
+
+let refreshing = null
+const listeners = new Set()
+
+// Call listener(accessToken) after every refresh; null means the session has ended
+export function onTokenRefresh(listener) {
+  listeners.add(listener)
+  return () => listeners.delete(listener)
+}
+
+function notify(accessToken) {
+  listeners.forEach((listener) => listener(accessToken))
+}
+
+async function refreshTokens(originalFetch) {
+  const refreshToken = localStorage.getItem('refresh_token')
+  if (!refreshToken) return null
+
+  const response = await originalFetch(REFRESH_URL, {
+    method: 'POST',
+    headers: { 'Authorization': `Bearer ${refreshToken}` }
+  })
+  if (!response.ok) {
+    localStorage.removeItem('token')
+    localStorage.removeItem('refresh_token')
+    notify(null)
+    return null
+  }
+
+  const data = await response.json()
+  localStorage.setItem('token', data.access_token)
+  localStorage.setItem('refresh_token', data.refresh_token)
+  notify(data.access_token)
+  return data.access_token
+}
+
+export function installAuthFetch() {
+  const originalFetch = window.fetch.bind(window)
+
+  window.fetch = async (input, init = {}) => {
+    const response = await originalFetch(input, init)
+    const headers = new Headers(init.headers || {})
+    const url = typeof input === 'string' ? input : input.url
+    if (response.status !== 401 || !headers.has('Authorization') || url.includes('/api/auth/')) {
+      return response
+    }
+
+    // Concurrent 401s share one refresh so the rotated token is not reused
+    refreshing = refreshing || refreshTokens(originalFetch).finally(() => { refreshing = null })
+    const accessToken = await refreshing
+    if (!accessToken) return response
+
+    headers.set('Authorization', `Bearer ${accessToken}`)
+    return originalFetch(input, { ...init, headers })
+  }
+}
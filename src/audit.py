@@ -0,0 +1,388 @@
+"""Audit log: role changes, activation code redemptions, medical info edits, exports and imports.
+
+Changes to the AUDITED fields are picked up after each flush and handed to
+an in-memory ring buffer once the transaction commits, so a rolled-back
+change is never logged and no request waits for an audit insert. Exports
+and bulk participant imports (one event per committed batch) are recorded
+explicitly with record(). Medical info is never copied into
+the log; the event only says that it changed.
+
+A background thread in each worker drains the buffer every
+AUDIT_FLUSH_SECONDS (sooner once AUDIT_BATCH_SIZE events are waiting) and
+writes each tenant's events with one multi-row INSERT into its audit_log
+table, or with AUDIT_BACKEND=files appends them as JSON lines to segment
+files under AUDIT_LOG_DIR that roll over at AUDIT_SEGMENT_BYTES. The buffer
+holds AUDIT_BUFFER_SIZE events; if writes keep failing the oldest are
+dropped and counted in audit_events_dropped_total instead of blocking writers.
+
+The app only ever inserts audit rows. query() reads them by user, entity and
+time range on the audit_log indexes; file segments outside the time range
+are skipped by the time in their name. Results are ordered by (occurred_at,
+id) and paged with a "<occurred_at>|<id>" cursor, so events sharing a
+timestamp are never skipped at a page boundary. File events get a
+"<segment>.<line>" id.
+"""
+import os
+import glob
+import time
+import atexit
+import threading
+from collections import deque
+from contextlib import nullcontext
+from datetime import datetime, timedelta, timezone
+from flask import request, current_app, has_app_context, has_request_context
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import event, or_, and_, inspect as sa_inspect
+from sqlalchemy.orm import Session
+from src.database import db
+from src.models.audit import AuditEvent
+from src.models.user import User
+from src.models.activation import UserActivation
+from src.models.settings import Participant
+from src.instrumentation import metrics, QUERY_BUCKETS
+from src.serialization import dumps, loads
+from src.tenancy import current_tenant, tenant_context
+
+AUDITED = {
+    User: ('role', 'is_active'),
+    Participant: ('medical_info',),
+}
+REDACTED = {'medical_info'}
+COLUMNS = ('occurred_at', 'user_id', 'action', 'entity_type', 'entity_id', 'changes', 'ip_address')
+SEGMENT_SLACK = timedelta(minutes=5)  # events may reach a segment a little after it was started
+MAX_LIMIT = 500
+
+metrics.describe('audit_events_total', 'counter', 'Audit events captured')
+metrics.describe('audit_events_dropped_total', 'counter', 'Audit events lost because the buffer was full')
+metrics.describe('audit_flush_seconds', 'histogram', 'Time spent writing one batch of audit events')
+
+def _actor():
+    """(user id, ip address) of the current request, if any"""
+    if not has_request_context():
+        return None, None
+    try:
+        identity = get_jwt_identity()
+    except RuntimeError:  # no token verified on this request
+        identity = None
+    try:
+        identity = int(identity) if identity is not None else None
+    except (TypeError, ValueError):
+        identity = None
+    return identity, request.remote_addr
+
+def make_event(action, entity_type, entity_id=None, changes=None, user_id=None):
+    actor, ip_address = _actor()
+    return {
+        'tenant': current_tenant(),
+        'occurred_at': datetime.utcnow(),
+        'user_id': user_id if user_id is not None else actor,
+        'action': action,
+        'entity_type': entity_type,
+        'entity_id': str(entity_id) if entity_id is not None else None,
+        'changes': changes or None,
+        'ip_address': ip_address
+    }
+
+def _changes(obj, fields, created=False):
+    state = sa_inspect(obj)
+    changes = {}
+    for field in fields:
+        history = state.attrs[field].history
+        if created:
+            value = getattr(obj, field)
+            if value is not None:
+                changes[field] = 'set' if field in REDACTED else [None, value]
+        elif history.has_changes():
+            old = history.deleted[0] if history.deleted else None
+            new = history.added[0] if history.added else None
+            changes[field] = 'changed' if field in REDACTED else [old, new]
+    return changes
+
+def _load_old_value(target, value, oldvalue, initiator):
+    return value
+
+# active_history loads the previous value of an expired attribute before it is overwritten
+for _model, _fields in AUDITED.items():
+    for _field in _fields:
+        event.listen(getattr(_model, _field), 'set', _load_old_value, active_history=True, retval=True)
+
+@event.listens_for(Session, 'after_flush')
+def collect_changes(session, flush_context):
+    """Queue events for this flush; they reach the buffer only if the transaction commits"""
+    events = []
+    for obj in session.new:
+        if isinstance(obj, UserActivation):
+            events.append(make_event('redeem', 'activation_codes', obj.activation_code_id,
+                                     {'user_id': obj.user_id}, user_id=_actor()[0] or obj.user_id))
+        elif type(obj) in AUDITED:
+            changes = _changes(obj, AUDITED[type(obj)], created=True)
+            events.append(make_event('create', obj.__tablename__, obj.id, changes))
+    for obj in session.dirty:
+        if type(obj) in AUDITED:
+            changes = _changes(obj, AUDITED[type(obj)])
+            if changes:
+                events.append(make_event('update', obj.__tablename__, obj.id, changes))
+    for obj in session.deleted:
+        if type(obj) in AUDITED:
+            events.append(make_event('delete', obj.__tablename__, obj.id))
+    if events:
+        session.info.setdefault('audit_pending', []).extend(events)
+
+@event.listens_for(Session, 'after_commit')
+def publish_changes(session):
+    events = session.info.pop('audit_pending', None)
+    if events:
+        audit_log.append(events)
+
+@event.listens_for(Session, 'after_rollback')
+def discard_changes(session):
+    session.info.pop('audit_pending', None)
+
+@event.listens_for(AuditEvent, 'before_update')
+@event.listens_for(AuditEvent, 'before_delete')
+def refuse_changes(mapper, connection, target):
+    raise ValueError('The audit log is append-only')
+
+def record(action, entity_type, entity_id=None, details=None, user_id=None):
+    """Log an event that is not a row change, such as an export"""
+    audit_log.append([make_event(action, entity_type, entity_id, details, user_id=user_id)])
+
+# Sinks
+
+def _in_tenant(tenant):
+    return nullcontext() if tenant == current_tenant() else tenant_context(tenant)
+
+def write_rows(app, tenant, events):
+    rows = [{column: e[column] for column in COLUMNS} for e in events]
+    with _in_tenant(tenant), db.engine.begin() as connection:
+        connection.execute(AuditEvent.__table__.insert(), rows)
+
+class SegmentLog:
+    """JSON-lines segment files per tenant: <tenant>-<started at>.jsonl"""
+
+    def __init__(self, directory, segment_bytes):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+
+    def segments(self, tenant):
+        """[(started_at, path)] oldest first"""
+        result = []
+        for path in glob.glob(os.path.join(self.directory, f'{tenant}-*.jsonl')):
+            stamp = os.path.basename(path)[len(tenant) + 1:-len('.jsonl')]
+            try:
+                result.append((datetime.strptime(stamp, '%Y%m%dT%H%M%S%f'), path))
+            except ValueError:
+                continue
+        return sorted(result)
+
+    def append(self, tenant, events):
+        """Callers serialize appends (AuditBuffer.write_lock)"""
+        os.makedirs(self.directory, exist_ok=True)
+        segments = self.segments(tenant)
+        if segments and os.path.getsize(segments[-1][1]) < self.segment_bytes:
+            path = segments[-1][1]
+        else:
+            stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')
+            path = os.path.join(self.directory, f'{tenant}-{stamp}.jsonl')
+        with open(path, 'ab') as f:
+            f.write(b''.join(dumps({column: e[column] for column in COLUMNS}) + b'\n' for e in events))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def read(self, tenant, since=None, until=None):
+        segments = self.segments(tenant)
+        for index, (started_at, path) in enumerate(segments):
+            if until is not None and started_at > until + SEGMENT_SLACK:
+                break
+            ends_at = segments[index + 1][0] if index + 1 < len(segments) else None
+            if since is not None and ends_at is not None and ends_at + SEGMENT_SLACK < since:
+                continue
+            stamp = started_at.strftime('%Y%m%dT%H%M%S%f')
+            with open(path, 'rb') as f:
+                for line_number, line in enumerate(f):
+                    if line.strip():
+                        row = loads(line)
+                        row['id'] = f'{stamp}.{line_number:09d}'  # sorts like the append order
+                        row['occurred_at'] = datetime.fromisoformat(row['occurred_at'])
+                        yield row
+
+def _segment_log(app):
+    directory = app.config.get('AUDIT_LOG_DIR') or os.path.join(os.path.dirname(__file__), 'database', 'audit')
+    return SegmentLog(directory, app.config.get('AUDIT_SEGMENT_BYTES', 8 * 1024 * 1024))
+
+def write_segments(app, tenant, events):
+    _segment_log(app).append(tenant, events)
+
+WRITERS = {'database': write_rows, 'files': write_segments}
+
+class AuditBuffer:
+    """Bounded buffer of committed events, drained in batches by a background thread"""
+
+    def __init__(self, size=10000, batch_size=500, flush_seconds=2.0):
+        self.events = deque(maxlen=size)
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.pid = None
+
+    def append(self, events):
+        if has_app_context():
+            self.start(current_app._get_current_object())
+        with self.lock:
+            dropped = max(0, len(self.events) + len(events) - self.events.maxlen)
+            self.events.extend(events)
+            waiting = len(self.events)
+        metrics.inc('audit_events_total', value=len(events))
+        if dropped:
+            metrics.inc('audit_events_dropped_total', value=dropped)
+        if waiting >= self.batch_size:
+            self.wakeup.set()
+
+    def _take(self, tenant=None):
+        with self.lock:
+            if tenant is None:
+                return [self.events.popleft() for _ in range(min(self.batch_size, len(self.events)))]
+            batch = [e for e in self.events if e['tenant'] == tenant][:self.batch_size]
+            if batch:
+                taken = set(map(id, batch))
+                kept = [e for e in self.events if id(e) not in taken]
+                self.events.clear()
+                self.events.extend(kept)
+            return batch
+
+    def _put_back(self, events):
+        with self.lock:
+            dropped = max(0, len(self.events) + len(events) - self.events.maxlen)
+            self.events.extendleft(reversed(events))  # a full buffer loses its newest events here
+        if dropped:
+            metrics.inc('audit_events_dropped_total', value=dropped)
+
+    def flush(self, app, tenant=None):
+        """Write buffered events (only one tenant's when given); returns the number written"""
+        writer = WRITERS[app.config.get('AUDIT_BACKEND', 'database')]
+        written = 0
+        with self.write_lock:
+            while True:
+                batch = self._take(tenant)
+                if not batch:
+                    return written
+                by_tenant = {}
+                for e in batch:
+                    by_tenant.setdefault(e['tenant'], []).append(e)
+                groups = list(by_tenant.items())
+                for index, (slug, events) in enumerate(groups):
+                    started = time.perf_counter()
+                    try:
+                        writer(app, slug, events)
+                    except Exception:
+                        self._put_back([e for _, group in groups[index:] for e in group])
+                        raise
+                    metrics.observe('audit_flush_seconds', time.perf_counter() - started, buckets=QUERY_BUCKETS)
+                    written += len(events)
+
+    def start(self, app):
+        """Start the flush thread for this process; safe to call after a fork"""
+        if self.pid == os.getpid():
+            return
+        self.pid = os.getpid()
+        self.batch_size = app.config.get('AUDIT_BATCH_SIZE', self.batch_size)
+        self.flush_seconds = app.config.get('AUDIT_FLUSH_SECONDS', self.flush_seconds)
+        size = app.config.get('AUDIT_BUFFER_SIZE', self.events.maxlen)
+        with self.lock:
+            if size != self.events.maxlen:
+                self.events = deque(self.events, maxlen=size)
+
+        def flush_in_app():
+            with app.app_context():
+                self.flush(app)
+
+        def run():
+            while True:
+                self.wakeup.wait(self.flush_seconds)
+                self.wakeup.clear()
+                try:
+                    flush_in_app()
+                except Exception:
+                    app.logger.exception('Audit log flush failed')
+
+        threading.Thread(target=run, name='audit-flush', daemon=True).start()
+        atexit.register(flush_in_app)
+
+audit_log = AuditBuffer()
+
+# Queries
+
+def format_cursor(event):
+    """Cursor of a query() result, to pass back as before"""
+    return f"{event['occurred_at']}|{event['id']}"
+
+def parse_cursor(cursor):
+    """(occurred_at, id) from a cursor; a bare time means everything before it"""
+    occurred_at, _, event_id = cursor.partition('|')
+    try:
+        occurred_at = datetime.fromisoformat(occurred_at)
+    except ValueError:
+        raise ValueError(f'Invalid audit cursor {cursor!r}')
+    if occurred_at.tzinfo is not None:
+        occurred_at = occurred_at.astimezone(timezone.utc).replace(tzinfo=None)
+    if event_id.isdigit():
+        event_id = int(event_id)
+    return occurred_at, event_id or None
+
+def _before(row, before):
+    occurred_at, event_id = before
+    if event_id is None or isinstance(row['id'], int) != isinstance(event_id, int):
+        return row['occurred_at'] < occurred_at
+    return (row['occurred_at'], row['id']) < (occurred_at, event_id)
+
+def _matches(row, user_id, action, entity_type, entity_id, since, until, before):
+    return ((user_id is None or row['user_id'] == user_id)
+            and (action is None or row['action'] == action)
+            and (entity_type is None or row['entity_type'] == entity_type)
+            and (entity_id is None or row['entity_id'] == str(entity_id))
+            and (since is None or row['occurred_at'] >= since)
+            and (until is None or row['occurred_at'] < until)
+            and (before is None or _before(row, before)))
+
+def query(user_id=None, entity_type=None, entity_id=None, since=None, until=None, action=None,
+          before=None, limit=100):
+    """Newest events first as dicts; pass format_cursor(last event) as before to page back"""
+    limit = max(1, min(limit, MAX_LIMIT))
+    if isinstance(before, str):
+        before = parse_cursor(before)
+    elif isinstance(before, datetime):
+        before = (before, None)
+    if current_app.config.get('AUDIT_BACKEND', 'database') == 'files':
+        rows = [row for row in _segment_log(current_app).read(current_tenant(), since, until)
+                if _matches(row, user_id, action, entity_type, entity_id, since, until, before)]
+        rows.sort(key=lambda row: (row['occurred_at'], row['id']), reverse=True)
+        return [dict(row, occurred_at=row['occurred_at'].isoformat()) for row in rows[:limit]]
+
+    events = AuditEvent.query
+    if user_id is not None:
+        events = events.filter(AuditEvent.user_id == user_id)
+    if entity_type is not None:
+        events = events.filter(AuditEvent.entity_type == entity_type)
+    if entity_id is not None:
+        events = events.filter(AuditEvent.entity_id == str(entity_id))
+    if action is not None:
+        events = events.filter(AuditEvent.action == action)
+    if since is not None:
+        events = events.filter(AuditEvent.occurred_at >= since)
+    if until is not None:
+        events = events.filter(AuditEvent.occurred_at < until)
+    if before is not None:
+        occurred_at, event_id = before
+        if isinstance(event_id, int):
+            events = events.filter(or_(AuditEvent.occurred_at < occurred_at,
+                                       and_(AuditEvent.occurred_at == occurred_at, AuditEvent.id < event_id)))
+        else:
+            events = events.filter(AuditEvent.occurred_at < occurred_at)
+    events = events.order_by(AuditEvent.occurred_at.desc(), AuditEvent.id.desc()).limit(limit)
+    return [e.to_dict() for e in events]
+
+def init_audit(app):
+    """Start flushing in this process (workers forked later start their own thread on first use)"""
+    audit_log.start(app)
@@ -0,0 +1,177 @@
+"""Incremental budget rollups.
+
+Every active budget report is broken into lines (month, category, creator,
+budget, spent) stored in budget_lines. When a report is created, edited or
+deactivated its previous lines are subtracted from budget_rollups and the new
+ones added, inside the same transaction, so dashboards read pre-aggregated
+totals instead of re-parsing every Report.data.
+
+    python -m src.budget rebuild    # recompute everything from Report.data
+"""
+import sys
+from sqlalchemy import event, func, select
+from src.database import db
+from src.models.user import Report, ReportFact
+from src.models.budget import BudgetLine, BudgetRollup
+
+def budget_lines(report):
+    """Lines contributed by a report; empty unless it is an active budget report"""
+    if report.type != 'budget' or not report.is_active:
+        return []
+
+    data = report.data if isinstance(report.data, dict) else {}
+    report_date = ReportFact.extract(report.type, data)['due_date']
+    if report_date:
+        month = report_date.strftime('%Y-%m')
+    elif report.created_at:
+        month = report.created_at.strftime('%Y-%m')
+    else:
+        return []
+
+    lines = []
+    categories = data.get('categories')
+    if isinstance(categories, list) and categories:
+        for category in categories:
+            if not isinstance(category, dict):
+                continue
+            lines.append({
+                'month': month,
+                'category': str(category.get('name') or '')[:100],
+                'created_by': report.created_by,
+                'budget': _amount(category.get('budget')),
+                'spent': _amount(category.get('spent'))
+            })
+    else:
+        facts = ReportFact.extract(report.type, data)
+        lines.append({
+            'month': month,
+            'category': '',
+            'created_by': report.created_by,
+            'budget': facts['amount'] or 0.0,
+            'spent': facts['spent'] or 0.0
+        })
+    return lines
+
+def _amount(value):
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+def _apply(connection, line, sign):
+    """Add (sign=1) or subtract (sign=-1) one line from its rollup row"""
+    table = BudgetRollup.__table__
+    key = ((table.c.month == line['month']) &
+           (table.c.category == line['category']) &
+           (table.c.created_by == line['created_by']))
+    result = connection.execute(table.update().where(key).values(
+        budget=table.c.budget + sign * line['budget'],
+        spent=table.c.spent + sign * line['spent'],
+        line_count=table.c.line_count + sign
+    ))
+    if result.rowcount == 0 and sign > 0:
+        connection.execute(table.insert().values(
+            month=line['month'], category=line['category'], created_by=line['created_by'],
+            budget=line['budget'], spent=line['spent'], line_count=1
+        ))
+
+def update_rollups(connection, report_id, new_lines):
+    """Replace a report's lines and move the rollups by the difference"""
+    lines_table = BudgetLine.__table__
+    old_lines = connection.execute(
+        select(lines_table.c.month, lines_table.c.category, lines_table.c.created_by,
+               lines_table.c.budget, lines_table.c.spent)
+        .where(lines_table.c.report_id == report_id)
+    ).mappings().all()
+
+    if not old_lines and not new_lines:
+        return
+
+    for line in old_lines:
+        _apply(connection, line, -1)
+    connection.execute(lines_table.delete().where(lines_table.c.report_id == report_id))
+
+    for line in new_lines:
+        _apply(connection, line, 1)
+        connection.execute(lines_table.insert().values(report_id=report_id, **line))
+
+    # Drop rollup rows that no longer have any lines
+    rollups = BudgetRollup.__table__
+    connection.execute(rollups.delete().where(rollups.c.line_count <= 0))
+
+@event.listens_for(Report, 'after_insert')
+@event.listens_for(Report, 'after_update')
+def sync_budget_rollups(mapper, connection, report):
+    update_rollups(connection, report.id, budget_lines(report))
+
+@event.listens_for(Report, 'after_delete')
+def remove_budget_rollups(mapper, connection, report):
+    update_rollups(connection, report.id, [])
+
+def rebuild():
+    """Recompute all lines and rollups from Report.data; returns the number of lines"""
+    BudgetRollup.query.delete()
+    BudgetLine.query.delete()
+
+    totals = {}
+    count = 0
+    for report in Report.query.filter_by(type='budget', is_active=True).yield_per(500):
+        for line in budget_lines(report):
+            db.session.add(BudgetLine(report_id=report.id, **line))
+            key = (line['month'], line['category'], line['created_by'])
+            total = totals.setdefault(key, [0.0, 0.0, 0])
+            total[0] += line['budget']
+            total[1] += line['spent']
+            total[2] += 1
+            count += 1
+
+    for (month, category, created_by), (budget, spent, line_count) in totals.items():
+        db.session.add(BudgetRollup(month=month, category=category, created_by=created_by,
+                                    budget=budget, spent=spent, line_count=line_count))
+    db.session.commit()
+    return count
+
+GROUP_COLUMNS = {
+    'month': BudgetRollup.month,
+    'category': BudgetRollup.category,
+    'creator': BudgetRollup.created_by
+}
+
+def query_rollups(month_from=None, month_to=None, category=None, created_by=None, group_by=('month',)):
+    """Aggregate rollups over a month range, grouped by any of month/category/creator"""
+    columns = [GROUP_COLUMNS[g] for g in group_by]
+    query = db.session.query(
+        *columns,
+        func.sum(BudgetRollup.budget),
+        func.sum(BudgetRollup.spent),
+        func.sum(BudgetRollup.line_count)
+    )
+    if month_from:
+        query = query.filter(BudgetRollup.month >= month_from)
+    if month_to:
+        query = query.filter(BudgetRollup.month <= month_to)
+    if category is not None:
+        query = query.filter(BudgetRollup.category == category)
+    if created_by is not None:
+        query = query.filter(BudgetRollup.created_by == created_by)
+    if columns:
+        query = query.group_by(*columns).order_by(*columns)
+
+    rows = []
+    for row in query.all():
+        keys = dict(zip(group_by, row[:len(columns)]))
+        budget, spent, line_count = row[len(columns):]
+        keys.update(budget=budget or 0.0, spent=spent or 0.0,
+                    remaining=(budget or 0.0) - (spent or 0.0), line_count=line_count or 0)
+        rows.append(keys)
+    return rows
+
+if __name__ == '__main__':
+    if sys.argv[1:] != ['rebuild']:
+        sys.exit('usage: python -m src.budget rebuild')
+    from src.main import app
+    from src.tenancy import tenant_slugs, tenant_context
+    with app.app_context():
+        for tenant in tenant_slugs():
+            with tenant_context(tenant):
+                print(f'{tenant}: rebuilt budget rollups from {rebuild()} lines')
@@ -0,0 +1,190 @@
+"""Response compression.
+
+An after_request hook negotiates the encoding from Accept-Encoding (q-values
+first, then COMPRESS_ENCODINGS order, default br, zstd, gzip) and compresses
+text-like responses. Buffered responses are compressed in one shot when
+they are at least COMPRESS_MIN_SIZE bytes; streamed ones (send_file
+downloads such as job exports, generators) are compressed chunk by chunk
+as they are sent, so the whole body is never held in memory.
+
+brotli and zstandard are optional; without them those encodings are simply
+not offered. zlib state templates and zstd compressors are kept per thread
+and reused instead of being set up for every response.
+
+Input/output bytes, the compression ratio and the CPU time spent are
+recorded in src.instrumentation metrics; with SERVER_TIMING on, buffered
+responses also report a compress entry.
+"""
+import time
+import zlib
+import threading
+from flask import g, request, current_app
+from src.instrumentation import metrics, QUERY_BUCKETS
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional encoding
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional encoding
+    zstandard = None
+
+DEFAULT_ENCODINGS = ('br', 'zstd', 'gzip')
+DEFAULT_LEVELS = {'br': 5, 'zstd': 3, 'gzip': 6}
+DEFAULT_MIN_SIZE = 1024
+COMPRESSIBLE_TYPES = {
+    'application/json', 'application/javascript', 'application/xml', 'application/manifest+json',
+    'image/svg+xml', 'text/html', 'text/css', 'text/csv', 'text/plain', 'text/javascript', 'text/xml'
+}
+RATIO_BUCKETS = (1, 1.5, 2, 3, 4, 6, 8, 12, 16, 24)
+
+metrics.describe('http_compression_input_bytes_total', 'counter', 'Response bytes before compression by encoding')
+metrics.describe('http_compression_output_bytes_total', 'counter', 'Response bytes after compression by encoding')
+metrics.describe('http_compression_ratio', 'histogram', 'Uncompressed / compressed size per response')
+metrics.describe('http_compression_cpu_seconds', 'histogram', 'CPU time spent compressing one response')
+
+_contexts = threading.local()
+
+def available_encodings():
+    encodings = ['gzip']
+    if brotli is not None:
+        encodings.append('br')
+    if zstandard is not None:
+        encodings.append('zstd')
+    return encodings
+
+class Encoder:
+    """Incremental compressor with a common compress()/flush() interface"""
+
+    def __init__(self, encoding, level):
+        self.encoding = encoding
+        if encoding == 'gzip':
+            encoder = _gzip_template(level).copy()
+            self.compress, self.flush = encoder.compress, encoder.flush
+        elif encoding == 'br':
+            encoder = brotli.Compressor(quality=level)
+            self.compress, self.flush = encoder.process, encoder.finish
+        elif encoding == 'zstd':
+            encoder = _zstd_compressor(level).compressobj()
+            self.compress, self.flush = encoder.compress, encoder.flush
+        else:
+            raise ValueError(f'Unsupported encoding {encoding!r}')
+
+def _gzip_template(level):
+    """A fresh gzip-framed zlib stream per level; copy() is cheaper than a new compressobj"""
+    templates = _contexts.__dict__.setdefault('gzip', {})
+    if level not in templates:
+        templates[level] = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return templates[level]
+
+def _zstd_compressor(level):
+    """ZstdCompressor objects are reusable but not thread-safe, so keep one per thread"""
+    compressors = _contexts.__dict__.setdefault('zstd', {})
+    if level not in compressors:
+        compressors[level] = zstandard.ZstdCompressor(level=level)
+    return compressors[level]
+
+def compress(data, encoding, level):
+    """Compress a complete body"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=level)
+    if encoding == 'zstd':
+        return _zstd_compressor(level).compress(data)  # one-shot frames record the content size
+    encoder = Encoder(encoding, level)
+    return encoder.compress(data) + encoder.flush()
+
+def negotiate(accept_encodings, preference):
+    """Best encoding acceptable to the client, or None"""
+    best, best_quality = None, 0
+    for encoding in preference:
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+def _record(encoding, size_in, size_out, cpu_seconds):
+    labels = {'encoding': encoding}
+    metrics.inc('http_compression_input_bytes_total', labels, size_in)
+    metrics.inc('http_compression_output_bytes_total', labels, size_out)
+    if size_out:
+        metrics.observe('http_compression_ratio', size_in / size_out, labels, RATIO_BUCKETS)
+    metrics.observe('http_compression_cpu_seconds', cpu_seconds, labels, QUERY_BUCKETS)
+
+def _compressible(response):
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return False
+    if request.method == 'HEAD' or 'Content-Encoding' in response.headers:
+        return False
+    if 'no-transform' in response.headers.get('Cache-Control', ''):
+        return False
+    return response.mimetype in COMPRESSIBLE_TYPES
+
+def _stream(chunks, encoder):
+    size_in = size_out = 0
+    cpu_seconds = 0.0
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            started = time.thread_time()
+            data = encoder.compress(chunk)
+            cpu_seconds += time.thread_time() - started
+            size_in += len(chunk)
+            if data:
+                size_out += len(data)
+                yield data
+        started = time.thread_time()
+        data = encoder.flush()
+        cpu_seconds += time.thread_time() - started
+        size_out += len(data)
+        yield data
+        _record(encoder.encoding, size_in, size_out, cpu_seconds)
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+def compress_response(response):
+    if not _compressible(response):
+        return response
+    response.vary.add('Accept-Encoding')
+
+    config = current_app.config
+    preference = [e for e in config.get('COMPRESS_ENCODINGS', DEFAULT_ENCODINGS) if e in available_encodings()]
+    encoding = negotiate(request.accept_encodings, preference)
+    if encoding is None:
+        return response
+
+    min_size = config.get('COMPRESS_MIN_SIZE', DEFAULT_MIN_SIZE)
+    level = {**DEFAULT_LEVELS, **config.get('COMPRESS_LEVELS', {})}[encoding]
+    if response.content_length is not None and response.content_length < min_size:
+        return response
+
+    if response.is_streamed or response.direct_passthrough:
+        response.response = _stream(response.response, Encoder(encoding, level))
+        response.direct_passthrough = False
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < min_size:
+            return response
+        started = time.thread_time()
+        compressed = compress(data, encoding, level)
+        cpu_seconds = time.thread_time() - started
+        if len(compressed) >= len(data):
+            return response
+        response.set_data(compressed)
+        _record(encoding, len(data), len(compressed), cpu_seconds)
+        g.compression_time = cpu_seconds
+
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f'{etag}-{encoding}', weak=weak)
+    return response
+
+def init_compression(app):
+    """Compress responses; call after init_instrumentation so its timing sees this hook"""
+    app.after_request(compress_response)
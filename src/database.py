@@ -1,4 +1,131 @@
+"""Database backends and read/write routing.
+
+DATABASE_URL selects the backend: SQLite by default, or PostgreSQL
+(postgres:// URLs as handed out by hosting providers are accepted). PostgreSQL
+engines keep a pool of DB_POOL_SIZE connections (+ DB_MAX_OVERFLOW), recycled
+after DB_POOL_RECYCLE seconds and pinged before use. Behind pgbouncer in
+transaction mode (DB_PGBOUNCER) the app keeps no pool of its own and psycopg 3
+prepared statements are turned off, since consecutive transactions may run on
+different server connections.
+
+DATABASE_REPLICA_URLS lists read replicas; they become the replica_1..n binds.
+RoutingSession sends reads to one replica while read routing is on (GET and
+HEAD requests, read_replica() blocks such as export jobs). Flushes and
+INSERT/UPDATE/DELETE statements always go to the primary, and once a request
+has written, its later reads stay on the primary so it sees its own writes.
+
+JSON columns use the JSON type below: JSONB on PostgreSQL, JSON elsewhere.
+"""
+import random
+from contextlib import contextmanager
+from flask import g, request, has_app_context
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy import JSON as _JSON
+from sqlalchemy.pool import NullPool
+from sqlalchemy.types import TypeDecorator
+from sqlalchemy.sql.dml import UpdateBase
+
+REPLICA_PREFIX = 'replica_'
+READ_METHODS = ('GET', 'HEAD')
+
+class JSON(TypeDecorator):
+    """JSON column stored as JSONB on PostgreSQL"""
+
+    impl = _JSON
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'postgresql':
+            from sqlalchemy.dialects.postgresql import JSONB  # the dialect package is slow to import
+            return dialect.type_descriptor(JSONB())
+        return dialect.type_descriptor(_JSON())
+
+def is_replica(bind_key):
+    return isinstance(bind_key, str) and bind_key.startswith(REPLICA_PREFIX)
+
+class RoutingSession(Session):
+    """Session that reads from a replica when allowed and writes to the primary"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        if bind is not None or not has_app_context():
+            return engine
+        if self._flushing or isinstance(clause, UpdateBase):
+            g.db_wrote = True
+            return engine
+        if not g.get('db_read_replica') or g.get('db_wrote'):
+            return engine
+
+        engines = self._db.engines
+        if engine is not engines.get(None):
+            return engine  # archive and registry binds have no replicas
+        replica = g.get('db_replica')
+        if replica is None or replica not in engines:
+            replicas = [key for key in engines if is_replica(key)]
+            if not replicas:
+                return engine
+            replica = g.db_replica = random.choice(replicas)  # one replica per request
+        return engines[replica]
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    """SQLAlchemy whose engines can be re-routed per request (see src.tenancy)"""
+
+    engine_router = None  # callable(default engines) -> engines for the current tenant
+
+    @property
+    def engines(self):
+        engines = super().engines
+        if self.engine_router is not None:
+            return self.engine_router(engines)
+        return engines
+
+db = RoutingSQLAlchemy(session_options={'class_': RoutingSession})
+
+def database_url(url):
+    if url.startswith('postgres://'):
+        return 'postgresql://' + url[len('postgres://'):]
+    return url
+
+def engine_options(url, config):
+    """create_engine() options for a URL; SQLite keeps SQLAlchemy's defaults"""
+    if not url.startswith('postgresql'):
+        return {}
+    if config.get('DB_PGBOUNCER'):
+        options = {'poolclass': NullPool}
+        if url.startswith('postgresql+psycopg:'):
+            options['connect_args'] = {'prepare_threshold': None}
+        return options
+    return {
+        'pool_size': config.get('DB_POOL_SIZE', 10),
+        'max_overflow': config.get('DB_MAX_OVERFLOW', 20),
+        'pool_recycle': config.get('DB_POOL_RECYCLE', 1800),
+        'pool_pre_ping': True
+    }
+
+def route_reads():
+    g.db_read_replica, g.db_wrote = request.method in READ_METHODS, False
+
+@contextmanager
+def read_replica():
+    """Send the reads of a block to a replica, even after earlier writes (requires an app context)"""
+    previous = g.get('db_read_replica', False), g.get('db_wrote', False)
+    g.db_read_replica, g.db_wrote = True, False
+    try:
+        yield
+    finally:
+        g.db_read_replica, g.db_wrote = previous
 
-db = SQLAlchemy()
+def configure_database(app):
+    """Engine URLs and options from DATABASE_URL and friends; call before db.init_app"""
+    config = app.config
+    url = database_url(config['DATABASE_URL'])
+    config['SQLALCHEMY_DATABASE_URI'] = url
+    config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(url, config)
 
+    binds = config.setdefault('SQLALCHEMY_BINDS', {})
+    for index, replica in enumerate(config.get('DATABASE_REPLICA_URLS') or [], 1):
+        replica = database_url(replica)
+        binds[f'{REPLICA_PREFIX}{index}'] = {'url': replica, **engine_options(replica, config)}
+    if config.get('DATABASE_REPLICA_URLS'):
+        app.before_request(route_reads)
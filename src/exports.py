@@ -0,0 +1,125 @@
+"""Rendering of report and participant exports, shared by the API and background jobs."""
+import csv
+import io
+from datetime import datetime
+from src.models.user import User, Report
+from src.models.settings import Participant
+from src.serialization import serialize, dumps
+
+EXPORT_CONTENT_TYPES = {
+    'json': 'application/json; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+    'txt': 'text/plain; charset=utf-8'
+}
+
+def export_filename(prefix, export_format):
+    return f'{prefix}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{export_format}'
+
+def query_reports_for_export(user_id, report_ids=None):
+    """Reports the given user is allowed to export"""
+    if report_ids:
+        query = Report.query.filter(Report.id.in_(report_ids), Report.is_active == True)
+    else:
+        query = Report.query.filter_by(is_active=True)
+
+    user = User.query.get(user_id)
+    if not user or not user.has_permission('admin'):
+        query = query.filter(Report.created_by == user_id)
+    return query.all()
+
+def query_participants_for_export():
+    return Participant.query.filter_by(status='active').all()
+
+def render_reports(reports, export_format, include_data=True, progress=None):
+    """Render reports as json, csv or txt; returns the content or None for unknown formats"""
+    total = len(reports)
+
+    if export_format == 'json':
+        export_data = serialize(reports, exclude=None if include_data else ('data',))
+        if progress:
+            progress(total, total)
+        return dumps(export_data)
+
+    elif export_format == 'csv':
+        output = io.StringIO()
+        writer = csv.writer(output)
+
+        # Write header
+        headers = ['ID', 'Type', 'Title', 'Content', 'Creator', 'Created At', 'Updated At']
+        writer.writerow(headers)
+
+        # Write data
+        for i, report in enumerate(reports):
+            writer.writerow([
+                report.id,
+                report.type,
+                report.title,
+                report.content or '',
+                report.creator.username if report.creator else '',
+                report.created_at.isoformat() if report.created_at else '',
+                report.updated_at.isoformat() if report.updated_at else ''
+            ])
+            if progress:
+                progress(i + 1, total)
+        return output.getvalue()
+
+    elif export_format == 'txt':
+        output = io.StringIO()
+
+        for i, report in enumerate(reports):
+            if i > 0:
+                output.write('\n' + '='*50 + '\n\n')
+
+            output.write(f"تقرير #{report.id}\n")
+            output.write(f"النوع: {report.type}\n")
+            output.write(f"العنوان: {report.title}\n")
+            output.write(f"المنشئ: {report.creator.username if report.creator else 'غير معروف'}\n")
+            output.write(f"تاريخ الإنشاء: {report.created_at.strftime('%Y-%m-%d %H:%M') if report.created_at else 'غير محدد'}\n")
+            output.write(f"\nالمحتوى:\n{report.content or 'لا يوجد محتوى'}\n")
+            if progress:
+                progress(i + 1, total)
+        return output.getvalue()
+
+    return None
+
+def render_participants(participants, export_format, include_medical=False, progress=None):
+    """Render participants as json or csv; returns the content or None for unknown formats"""
+    total = len(participants)
+
+    if export_format == 'json':
+        export_data = serialize(participants, exclude=None if include_medical else ('medical_info',))
+        if progress:
+            progress(total, total)
+        return dumps(export_data)
+
+    elif export_format == 'csv':
+        output = io.StringIO()
+        writer = csv.writer(output)
+
+        # Write header
+        headers = ['ID', 'Name', 'Email', 'Phone', 'Age', 'Role', 'Join Date', 'Emergency Contact', 'Emergency Phone']
+        if include_medical:
+            headers.append('Medical Info')
+        writer.writerow(headers)
+
+        # Write data
+        for i, participant in enumerate(participants):
+            row = [
+                participant.id,
+                participant.name,
+                participant.email or '',
+                participant.phone or '',
+                participant.age or '',
+                participant.role or '',
+                participant.join_date.isoformat() if participant.join_date else '',
+                participant.emergency_contact or '',
+                participant.emergency_phone or ''
+            ]
+            if include_medical:
+                row.append(participant.medical_info or '')
+            writer.writerow(row)
+            if progress:
+                progress(i + 1, total)
+        return output.getvalue()
+
+    return None
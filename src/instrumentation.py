@@ -0,0 +1,210 @@
+"""Request and SQL instrumentation.
+
+Flask before/after_request hooks time every request; SQLAlchemy cursor events
+time every query issued while handling it. Results are kept in an in-process
+registry and exposed in the Prometheus text format at /metrics (each worker
+process reports its own numbers). executemany batches count as queries but
+not as repeats of one statement, so batched inserts are not taken for N+1.
+
+Config:
+- SERVER_TIMING        add a Server-Timing header with app/db time (default off)
+- SLOW_QUERY_MS        log queries slower than this (default 200)
+- N_PLUS_ONE_THRESHOLD flag a statement repeated this often in one request (default 10)
+- PROFILE_SAMPLE_RATE  fraction of requests to run under cProfile (default 0)
+- PROFILE_ON_REQUEST   allow profiling a single request with an X-Profile: 1 header
+- PROFILE_DIR          where .prof files are written
+- METRICS_ENABLED      serve /metrics (default off)
+- METRICS_TOKEN        if set, /metrics requires Authorization: Bearer <token>
+"""
+import os
+import hmac
+import time
+import random
+import threading
+from collections import Counter
+from flask import g, request, has_request_context, current_app, Response, abort
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 500)
+
+class Metrics:
+    """Thread-safe counters and histograms rendered in Prometheus text format"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.help = {}
+
+    def describe(self, name, kind, text):
+        self.help[name] = (kind, text)
+
+    def inc(self, name, labels=None, value=1):
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, labels=None, buckets=LATENCY_BUCKETS):
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {'buckets': buckets, 'counts': [0] * len(buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(histogram['buckets']):
+                if value <= bound:
+                    histogram['counts'][i] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def render(self):
+        lines = []
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items(), key=lambda item: item[0])
+
+        described = set()
+        for (name, labels), value in counters:
+            self._header(lines, described, name, 'counter')
+            lines.append(f'{name}{_labels(labels)} {value}')
+
+        for (name, labels), histogram in histograms:
+            self._header(lines, described, name, 'histogram')
+            for bound, count in zip(histogram['buckets'], histogram['counts']):
+                lines.append(f'{name}_bucket{_labels(labels + (("le", _number(bound)),))} {count}')
+            lines.append(f'{name}_bucket{_labels(labels + (("le", "+Inf"),))} {histogram["count"]}')
+            lines.append(f'{name}_sum{_labels(labels)} {histogram["sum"]:.6f}')
+            lines.append(f'{name}_count{_labels(labels)} {histogram["count"]}')
+        return '\n'.join(lines) + '\n'
+
+    def _header(self, lines, described, name, default_kind):
+        if name in described:
+            return
+        described.add(name)
+        kind, text = self.help.get(name, (default_kind, name))
+        lines.append(f'# HELP {name} {text}')
+        lines.append(f'# TYPE {name} {kind}')
+
+def _number(value):
+    return f'{value:g}'
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+metrics = Metrics()
+metrics.describe('http_request_duration_seconds', 'histogram', 'Request latency by endpoint')
+metrics.describe('http_requests_total', 'counter', 'Requests by endpoint, method and status')
+metrics.describe('db_queries_per_request', 'histogram', 'SQL statements executed per request')
+metrics.describe('db_query_duration_seconds', 'histogram', 'SQL statement latency by endpoint')
+metrics.describe('db_slow_queries_total', 'counter', 'Statements slower than SLOW_QUERY_MS')
+metrics.describe('db_n_plus_one_total', 'counter', 'Requests repeating one statement N_PLUS_ONE_THRESHOLD times or more')
+
+def _endpoint():
+    return request.endpoint or 'unmatched'
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the execution context, so a failed statement leaves nothing behind on the connection
+    if context is not None:
+        context._query_start = time.perf_counter()
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_query_start', None)
+    if started is None:
+        return
+    duration = time.perf_counter() - started
+
+    if not has_request_context() or 'instrumentation' not in g:
+        return
+    stats = g.instrumentation
+    stats['query_count'] += 1
+    stats['query_time'] += duration
+    if not executemany:
+        stats['statements'][statement] += 1
+    metrics.observe('db_query_duration_seconds', duration, {'endpoint': _endpoint()}, QUERY_BUCKETS)
+
+    slow_ms = current_app.config.get('SLOW_QUERY_MS', 200)
+    if duration * 1000 >= slow_ms:
+        metrics.inc('db_slow_queries_total', {'endpoint': _endpoint()})
+        current_app.logger.warning('Slow query (%.1f ms) in %s: %s', duration * 1000, _endpoint(), statement)
+
+def before_request():
+    g.instrumentation = {
+        'start': time.perf_counter(),
+        'query_count': 0,
+        'query_time': 0.0,
+        'statements': Counter()
+    }
+
+    # Profile a random sample of requests, or one request on demand via X-Profile: 1
+    sample_rate = current_app.config.get('PROFILE_SAMPLE_RATE', 0)
+    on_demand = current_app.config.get('PROFILE_ON_REQUEST') and request.headers.get('X-Profile') == '1'
+    if on_demand or (sample_rate and random.random() < sample_rate):
+        import cProfile  # only loaded once profiling is switched on
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+def after_request(response):
+    stats = g.pop('instrumentation', None)
+    if stats is None:
+        return response
+
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        _dump_profile(profiler)
+
+    duration = time.perf_counter() - stats['start']
+    endpoint = _endpoint()
+    metrics.observe('http_request_duration_seconds', duration, {'endpoint': endpoint})
+    metrics.inc('http_requests_total', {'endpoint': endpoint, 'method': request.method, 'status': response.status_code})
+    metrics.observe('db_queries_per_request', stats['query_count'], {'endpoint': endpoint}, COUNT_BUCKETS)
+
+    threshold = current_app.config.get('N_PLUS_ONE_THRESHOLD', 10)
+    if stats['statements']:
+        statement, repeats = stats['statements'].most_common(1)[0]
+        if repeats >= threshold:
+            metrics.inc('db_n_plus_one_total', {'endpoint': endpoint})
+            current_app.logger.warning('Possible N+1 in %s: statement ran %d times: %s', endpoint, repeats, statement)
+
+    if current_app.config.get('SERVER_TIMING'):
+        app_time = max(duration - stats['query_time'], 0)
+        response.headers.add('Server-Timing', f'db;dur={stats["query_time"] * 1000:.1f};desc="{stats["query_count"]} queries"')
+        response.headers.add('Server-Timing', f'app;dur={app_time * 1000:.1f}')
+        if 'compression_time' in g:
+            response.headers.add('Server-Timing', f'compress;dur={g.compression_time * 1000:.1f}')
+        response.headers.add('Server-Timing', f'total;dur={duration * 1000:.1f}')
+    return response
+
+def _dump_profile(profiler):
+    directory = current_app.config.get('PROFILE_DIR') or os.path.join(os.path.dirname(__file__), 'database', 'profiles')
+    os.makedirs(directory, exist_ok=True)
+    filename = f'{_endpoint().replace(".", "_")}-{time.strftime("%Y%m%d_%H%M%S")}-{os.getpid()}.prof'
+    profiler.dump_stats(os.path.join(directory, filename))
+
+def metrics_view():
+    if not current_app.config.get('METRICS_ENABLED'):
+        abort(404)
+    token = current_app.config.get('METRICS_TOKEN')
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        abort(401)
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+def init_instrumentation(app):
+    """Install the request hooks and the /metrics endpoint on an app"""
+    app.before_request(before_request)
+    app.after_request(after_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
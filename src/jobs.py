@@ -0,0 +1,185 @@
+"""Persistent background jobs stored in SQLite and run by a worker process pool.
+
+Web requests only call ``enqueue`` and hand the job id back to the client.
+Workers started with ``python -m src.jobs`` claim queued jobs, run the
+registered handler and retry failures with exponential backoff. Every
+tenant database has its own queue and workers poll all of them.
+"""
+import os
+import sys
+import time
+import socket
+import traceback
+import multiprocessing
+from datetime import datetime, timedelta
+from src.database import db
+from src.models.job import Job
+from src.tenancy import tenant_slugs, tenant_context, dispose_engines
+
+# Registered job handlers, keyed by job type
+handlers = {}
+
+DEFAULT_MAX_ATTEMPTS = 3
+BACKOFF_BASE_SECONDS = 5
+BACKOFF_MAX_SECONDS = 600
+
+def job_handler(job_type):
+    """Register a function as the handler for a job type"""
+    def decorator(f):
+        handlers[job_type] = f
+        return f
+    return decorator
+
+def artifact_dir(app):
+    """Directory where finished job artifacts are written"""
+    path = app.config.get('JOBS_ARTIFACT_DIR') or os.path.join(os.path.dirname(__file__), 'database', 'jobs')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def enqueue(job_type, payload=None, created_by=None, max_attempts=None, delay_seconds=0):
+    """Persist a new job and return it; the caller returns job.id to the client"""
+    job = Job(
+        type=job_type,
+        payload=payload or {},
+        created_by=created_by,
+        max_attempts=max_attempts or DEFAULT_MAX_ATTEMPTS,
+        run_after=datetime.utcnow() + timedelta(seconds=delay_seconds)
+    )
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+def backoff_seconds(attempts):
+    """Delay before the next attempt after ``attempts`` failed runs"""
+    return min(BACKOFF_BASE_SECONDS * (2 ** max(attempts - 1, 0)), BACKOFF_MAX_SECONDS)
+
+def claim_next(worker_id):
+    """Atomically claim the oldest runnable job, or return None"""
+    now = datetime.utcnow()
+    candidates = (Job.query
+                  .filter(Job.status == 'queued', Job.run_after <= now)
+                  .order_by(Job.run_after, Job.created_at)
+                  .with_entities(Job.id)
+                  .limit(5)
+                  .all())
+    for (job_id,) in candidates:
+        # Conditional update so two workers never run the same job
+        claimed = (Job.query
+                   .filter(Job.id == job_id, Job.status == 'queued')
+                   .update({
+                       Job.status: 'running',
+                       Job.locked_by: worker_id,
+                       Job.attempts: Job.attempts + 1,
+                       Job.started_at: now,
+                       Job.updated_at: now
+                   }, synchronize_session=False))
+        db.session.commit()
+        if claimed:
+            return db.session.get(Job, job_id)
+    return None
+
+def set_progress(job, done, total=None):
+    """Record job progress as a percentage; ``done`` may already be a percentage"""
+    percent = int(done * 100 / total) if total else int(done)
+    percent = max(0, min(percent, 100))
+    if percent != job.progress:
+        job.progress = percent
+        db.session.commit()
+
+def save_artifact(app, job, content, filename, content_type):
+    """Write the job's output file and attach it to the job"""
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    extension = os.path.splitext(filename)[1]
+    path = os.path.join(artifact_dir(app), f'{job.id}{extension}')
+    with open(path, 'wb') as f:
+        f.write(content)
+    job.artifact_path = path
+    job.artifact_name = filename
+    job.artifact_type = content_type
+
+def run_job(app, job):
+    """Run a claimed job and record success, retry or failure"""
+    handler = handlers.get(job.type)
+    try:
+        if handler is None:
+            raise LookupError(f'No handler registered for job type {job.type!r}')
+        result = handler(app, job)
+        job.status = 'succeeded'
+        job.progress = 100
+        job.result = result
+        job.error = None
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        job = db.session.get(Job, job.id)
+        job.error = f'{type(e).__name__}: {e}'
+        if job.attempts < job.max_attempts and handler is not None:
+            job.status = 'queued'
+            job.run_after = datetime.utcnow() + timedelta(seconds=backoff_seconds(job.attempts))
+        else:
+            job.status = 'failed'
+            job.finished_at = datetime.utcnow()
+        job.locked_by = None
+        db.session.commit()
+        traceback.print_exc()
+    return job
+
+def requeue_stale(timeout_seconds=3600):
+    """Put back jobs whose worker died while running them"""
+    cutoff = datetime.utcnow() - timedelta(seconds=timeout_seconds)
+    count = (Job.query
+             .filter(Job.status == 'running', Job.started_at < cutoff)
+             .update({Job.status: 'queued', Job.locked_by: None}, synchronize_session=False))
+    db.session.commit()
+    return count
+
+def work(app, worker_id=None, poll_interval=1.0, once=False):
+    """Claim and run jobs until interrupted (or until the queue is empty with once=True)"""
+    # Make sure all handlers are registered in this process
+    import src.tasks  # noqa: F401
+
+    worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}'
+    with app.app_context():
+        while True:
+            # Each tenant keeps its own queue; take at most one job per tenant per pass
+            ran = False
+            for tenant in tenant_slugs():
+                with tenant_context(tenant):
+                    job = claim_next(worker_id)
+                    if job is not None:
+                        run_job(app, job)
+                        ran = True
+            if not ran:
+                if once:
+                    return
+                time.sleep(poll_interval)
+
+def _worker_main(poll_interval):
+    from src.main import app
+    work(app, poll_interval=poll_interval)
+
+def run_pool(processes=2, poll_interval=1.0):
+    """Start a pool of worker processes and wait for them"""
+    from src.main import app
+    with app.app_context():
+        for tenant in tenant_slugs():
+            with tenant_context(tenant):
+                requeue_stale(app.config.get('JOBS_STALE_SECONDS', 3600))
+        # Forked workers must not share the parent's pooled connections
+        dispose_engines()
+
+    workers = [multiprocessing.Process(target=_worker_main, args=(poll_interval,), daemon=True)
+               for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        for worker in workers:
+            worker.terminate()
+
+if __name__ == '__main__':
+    run_pool(processes=int(sys.argv[1]) if len(sys.argv) > 1 else int(os.environ.get('JOBS_WORKERS', 2)))
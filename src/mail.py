@@ -0,0 +1,56 @@
+"""Outgoing email.
+
+MAIL_BACKEND selects how messages leave the app:
+- 'smtp'   sends through MAIL_SERVER/MAIL_PORT (optionally with TLS and login)
+- 'outbox' is a local SMTP stand-in that writes each message as an .eml file
+           to MAIL_OUTBOX_DIR, for development and tests
+"""
+import os
+import smtplib
+import uuid
+from email.message import EmailMessage
+
+def build_message(app, recipients, subject, body, attachments=None):
+    message = EmailMessage()
+    message['From'] = app.config.get('MAIL_DEFAULT_SENDER', 'noreply@scoutteam.sa')
+    message['To'] = ', '.join(recipients)
+    message['Subject'] = subject
+    message.set_content(body)
+    for filename, content, content_type in attachments or []:
+        maintype, _, subtype = content_type.split(';')[0].partition('/')
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        message.add_attachment(content, maintype=maintype, subtype=subtype, filename=filename)
+    return message
+
+def outbox_dir(app):
+    path = app.config.get('MAIL_OUTBOX_DIR') or os.path.join(os.path.dirname(__file__), 'database', 'outbox')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def send_mail(app, recipients, subject, body, attachments=None):
+    """Send a message with the configured backend"""
+    if not recipients:
+        raise ValueError('No recipients given')
+
+    message = build_message(app, recipients, subject, body, attachments)
+    backend = app.config.get('MAIL_BACKEND', 'outbox')
+
+    if backend == 'outbox':
+        path = os.path.join(outbox_dir(app), f'{uuid.uuid4().hex}.eml')
+        with open(path, 'wb') as f:
+            f.write(bytes(message))
+        return path
+
+    if backend == 'smtp':
+        server = app.config.get('MAIL_SERVER', 'localhost')
+        port = int(app.config.get('MAIL_PORT', 25))
+        with smtplib.SMTP(server, port, timeout=app.config.get('MAIL_TIMEOUT', 30)) as smtp:
+            if app.config.get('MAIL_USE_TLS'):
+                smtp.starttls()
+            if app.config.get('MAIL_USERNAME'):
+                smtp.login(app.config['MAIL_USERNAME'], app.config.get('MAIL_PASSWORD', ''))
+            smtp.send_message(message)
+        return None
+
+    raise ValueError(f'Unknown MAIL_BACKEND {backend!r}')
@@ -3,21 +3,26 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory
+from datetime import timedelta
+from flask import Flask, send_from_directory, jsonify, request
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from src.models.user import db, User
-from src.routes.user import user_bp
-from src.routes.auth import auth_bp
-from src.routes.reports import reports_bp
-from src.routes.settings import settings_bp
-from src.routes.sharing import sharing_bp
-from src.routes.activation import activation_bp
+from src.database import configure_database, database_url
+from src.serialization import FastJSONProvider
+from src.instrumentation import init_instrumentation
+from src.compression import init_compression
+from src.sessions import blocklist
+from src.tenancy import init_tenancy, ensure_schema, token_matches_tenant
+from src.startup import init_lazy_blueprints, import_models
+from src.audit import init_audit
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
+app.json = FastJSONProvider(app)  # compact orjson encoding for every jsonify()
 app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
 app.config['JWT_SECRET_KEY'] = 'jwt-secret-string-change-in-production'
-app.config['JWT_ACCESS_TOKEN_EXPIRES'] = False  # Tokens don't expire for demo
+app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(minutes=int(os.environ.get('ACCESS_TOKEN_MINUTES', 15)))
+app.config['JWT_REFRESH_TOKEN_EXPIRES'] = timedelta(days=int(os.environ.get('REFRESH_TOKEN_DAYS', 30)))
 
 # Enable CORS for all routes
 CORS(app, origins="*")
@@ -25,38 +30,103 @@ CORS(app, origins="*")
 # Initialize JWT
 jwt = JWTManager(app)
 
-# Register blueprints
-app.register_blueprint(auth_bp, url_prefix='/api/auth')
-app.register_blueprint(user_bp, url_prefix='/api/users')
-app.register_blueprint(reports_bp, url_prefix='/api/reports')
-app.register_blueprint(settings_bp)
-app.register_blueprint(sharing_bp)
-app.register_blueprint(activation_bp)
+# Blueprints are imported and registered just before the first request (see src/startup.py)
+init_lazy_blueprints(app)
 
-# Database configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+# Request timing, SQL instrumentation and /metrics
+app.config['SERVER_TIMING'] = os.environ.get('SERVER_TIMING') == '1'
+app.config['SLOW_QUERY_MS'] = float(os.environ.get('SLOW_QUERY_MS', 200))
+app.config['N_PLUS_ONE_THRESHOLD'] = int(os.environ.get('N_PLUS_ONE_THRESHOLD', 10))
+app.config['PROFILE_SAMPLE_RATE'] = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+app.config['PROFILE_ON_REQUEST'] = os.environ.get('PROFILE_ON_REQUEST') == '1'
+app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED') == '1'
+app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+init_instrumentation(app)
+
+# Response compression (br/zstd when their packages are installed, gzip otherwise)
+app.config['COMPRESS_ENCODINGS'] = os.environ.get('COMPRESS_ENCODINGS', 'br,zstd,gzip').split(',')
+app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+init_compression(app)
+
+# Database configuration: SQLite or PostgreSQL, optional read replicas (see src/database.py)
+app.config['DATABASE_URL'] = os.environ.get('DATABASE_URL', f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}")
+app.config['DATABASE_REPLICA_URLS'] = [url.strip() for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', 10))
+app.config['DB_MAX_OVERFLOW'] = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+app.config['DB_POOL_RECYCLE'] = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+app.config['DB_PGBOUNCER'] = os.environ.get('DB_PGBOUNCER') == '1'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SCHEMA_CHECK'] = os.environ.get('SCHEMA_CHECK', 'stamp')  # stamp, always
+app.config['SQLALCHEMY_BINDS'] = {
+    'archive': os.environ.get('ARCHIVE_DATABASE_URI', f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'archive.db')}"),
+    'registry': os.environ.get('TENANT_REGISTRY_URI', database_url(app.config['DATABASE_URL']))
+}
+configure_database(app)
+
+# Tenancy: each troop gets its own database, selected per request (see src/tenancy.py)
+app.config['TENANT_BASE_DOMAIN'] = os.environ.get('TENANT_BASE_DOMAIN')
+app.config['TENANT_DATABASE_DIR'] = os.environ.get('TENANT_DATABASE_DIR', os.path.join(os.path.dirname(__file__), 'database', 'tenants'))
+app.config['TENANT_POOL_SIZE'] = int(os.environ.get('TENANT_POOL_SIZE', 5))
+
+# Retention policies (days; 0 disables a policy), see src/retention.py
+app.config['RETENTION_NOTIFICATION_DAYS'] = int(os.environ.get('RETENTION_NOTIFICATION_DAYS', 90))
+app.config['RETENTION_COMMENT_DAYS'] = int(os.environ.get('RETENTION_COMMENT_DAYS', 30))
+app.config['RETENTION_REPORT_DAYS'] = int(os.environ.get('RETENTION_REPORT_DAYS', 30))
+app.config['RETENTION_TOMBSTONE_DAYS'] = int(os.environ.get('RETENTION_TOMBSTONE_DAYS', 90))
+app.config['RETENTION_BATCH_SIZE'] = int(os.environ.get('RETENTION_BATCH_SIZE', 500))
+app.config['RETENTION_PAUSE_SECONDS'] = float(os.environ.get('RETENTION_PAUSE_SECONDS', 0.05))
+app.config['RETENTION_VACUUM_MIN_ROWS'] = int(os.environ.get('RETENTION_VACUUM_MIN_ROWS', 1000))
 db.init_app(app)
+init_tenancy(app)
+
+# Background jobs and email
+app.config['JOBS_ARTIFACT_DIR'] = os.environ.get('JOBS_ARTIFACT_DIR', os.path.join(os.path.dirname(__file__), 'database', 'jobs'))
+app.config['MAIL_BACKEND'] = os.environ.get('MAIL_BACKEND', 'outbox')  # smtp, outbox
+app.config['MAIL_SERVER'] = os.environ.get('MAIL_SERVER', 'localhost')
+app.config['MAIL_PORT'] = int(os.environ.get('MAIL_PORT', 25))
+app.config['MAIL_USE_TLS'] = os.environ.get('MAIL_USE_TLS') == '1'
+app.config['MAIL_USERNAME'] = os.environ.get('MAIL_USERNAME')
+app.config['MAIL_PASSWORD'] = os.environ.get('MAIL_PASSWORD')
+app.config['MAIL_DEFAULT_SENDER'] = os.environ.get('MAIL_DEFAULT_SENDER', 'noreply@scoutteam.sa')
+
+# Token blocklist: how often each worker picks up revocations from other workers
+app.config['BLOCKLIST_SYNC_SECONDS'] = float(os.environ.get('BLOCKLIST_SYNC_SECONDS', 2))
+
+# Audit log: buffered in memory, written in batches (see src/audit.py)
+app.config['AUDIT_BACKEND'] = os.environ.get('AUDIT_BACKEND', 'database')  # database, files
+app.config['AUDIT_LOG_DIR'] = os.environ.get('AUDIT_LOG_DIR', os.path.join(os.path.dirname(__file__), 'database', 'audit'))
+app.config['AUDIT_SEGMENT_BYTES'] = int(os.environ.get('AUDIT_SEGMENT_BYTES', 8 * 1024 * 1024))
+app.config['AUDIT_BUFFER_SIZE'] = int(os.environ.get('AUDIT_BUFFER_SIZE', 10000))
+app.config['AUDIT_BATCH_SIZE'] = int(os.environ.get('AUDIT_BATCH_SIZE', 500))
+app.config['AUDIT_FLUSH_SECONDS'] = float(os.environ.get('AUDIT_FLUSH_SECONDS', 2))
+init_audit(app)
 
 # JWT user loader
 @jwt.user_identity_loader
 def user_identity_lookup(user):
-    return user.id
+    return str(user.id)  # PyJWT requires a string "sub"; routes read it back with jwt_user_id()
+
+@jwt.token_in_blocklist_loader
+def check_if_token_revoked(_jwt_header, jwt_payload):
+    blocklist.start(app)  # no-op once running in this process
+    return blocklist.is_revoked(jwt_payload)
+
+@jwt.token_verification_loader
+def check_token_tenant(_jwt_header, jwt_payload):
+    return token_matches_tenant(jwt_payload)
 
 @jwt.user_lookup_loader
 def user_lookup_callback(_jwt_header, jwt_data):
-    identity = jwt_data["sub"]
+    identity = int(jwt_data["sub"])
     return User.query.filter_by(id=identity).one_or_none()
 
 # Create tables and default admin user
 with app.app_context():
-    db.create_all()
-    
-    # Import all models to ensure they're created
-    from src.models.activation import ActivationCode, UserActivation, Comment, CommentLike, Notification
-    from src.models.settings import SiteSettings, Participant, Activity, Attendance
-    db.create_all()
-    
+    # Create or upgrade the schema unless the database is stamped with the current version
+    import_models()
+    ensure_schema(force=app.config['SCHEMA_CHECK'] == 'always')
+    from src.models.activation import ActivationCode
+
     # Create default admin user if not exists
     admin_user = User.query.filter_by(username='admin').first()
     if not admin_user:
@@ -86,6 +156,10 @@ with app.app_context():
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve(path):
+    if path == 'api' or path.startswith('api/'):
+        # Unknown API calls must fail clearly, not receive the SPA's index.html
+        return jsonify({'error': 'API endpoint not found', 'path': f'/{path}'}), 404
+
     static_folder_path = app.static_folder
     if static_folder_path is None:
             return "Static folder not configured", 404
@@ -99,6 +173,14 @@ def serve(path):
         else:
             return "index.html not found", 404
 
+@app.errorhandler(405)
+def api_method_not_allowed(error):
+    if not request.path.startswith('/api/'):
+        return error
+    endpoint, _ = app.create_url_adapter(request).match(method='GET')
+    if endpoint == 'serve':  # only the SPA catch-all matched: no such API endpoint
+        return serve(request.path.lstrip('/'))
+    return jsonify({'error': 'Method not allowed', 'path': request.path}), 405
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -117,6 +117,7 @@ class UserActivation(db.Model):
 
 class Comment(db.Model):
     __tablename__ = 'comments'
+    __table_args__ = {'sqlite_autoincrement': True}  # ids of archived comments are never handed out again
     
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
@@ -174,6 +175,7 @@ class Notification(db.Model):
     related_id = db.Column(db.Integer, nullable=True)  # ID of related object (report, comment, etc.)
     is_read = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # delta sync cursor
     
     user = db.relationship('User', backref='notifications', foreign_keys=[user_id])
     
@@ -186,6 +188,7 @@ class Notification(db.Model):
             'type': self.type,
             'related_id': self.related_id,
             'is_read': self.is_read,
-            'created_at': self.created_at.isoformat() if self.created_at else None
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
@@ -0,0 +1,65 @@
+from datetime import datetime
+from src.database import db, JSON
+
+class ArchivedReport(db.Model):
+    """An inactive report moved out of the hot database by the retention engine"""
+    __bind_key__ = 'archive'
+    __tablename__ = 'archived_reports'
+
+    id = db.Column(db.Integer, primary_key=True)  # same id as in the report table
+    type = db.Column(db.String(20), nullable=False)
+    title = db.Column(db.String(200), nullable=False)
+    content = db.Column(db.Text, nullable=True)
+    data = db.Column(JSON, nullable=True)
+    created_by = db.Column(db.Integer, nullable=False, index=True)
+    creator_name = db.Column(db.String(80), nullable=True)  # users live in the hot database
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    is_active = db.Column(db.Boolean, default=False)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'type': self.type,
+            'title': self.title,
+            'content': self.content,
+            'data': self.data,
+            'created_by': self.created_by,
+            'creator_name': self.creator_name,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'is_active': self.is_active,
+            'archived': True,
+            'archived_at': self.archived_at.isoformat() if self.archived_at else None
+        }
+
+class ArchivedComment(db.Model):
+    """A comment archived together with its report"""
+    __bind_key__ = 'archive'
+    __tablename__ = 'archived_comments'
+
+    id = db.Column(db.Integer, primary_key=True)
+    content = db.Column(db.Text, nullable=False)
+    report_id = db.Column(db.Integer, nullable=False, index=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    user_name = db.Column(db.String(80), nullable=True)
+    parent_id = db.Column(db.Integer, nullable=True)
+    likes_count = db.Column(db.Integer, default=0)
+    is_active = db.Column(db.Boolean, default=True)
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'content': self.content,
+            'report_id': self.report_id,
+            'user_id': self.user_id,
+            'user_name': self.user_name,
+            'parent_id': self.parent_id,
+            'likes_count': self.likes_count,
+            'is_active': self.is_active,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
@@ -0,0 +1,33 @@
+from datetime import datetime
+from src.database import db, JSON
+
+class AuditEvent(db.Model):
+    """Append-only record of a sensitive change or data export (written by src.audit)"""
+    __tablename__ = 'audit_log'
+
+    id = db.Column(db.Integer, primary_key=True)
+    occurred_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    user_id = db.Column(db.Integer, nullable=True)  # who did it; None for the system
+    action = db.Column(db.String(30), nullable=False)  # create, update, delete, redeem, export, import
+    entity_type = db.Column(db.String(50), nullable=False)  # users, participants, activation_codes, ...
+    entity_id = db.Column(db.String(64), nullable=True)
+    changes = db.Column(JSON, nullable=True)  # {field: [old, new]}; sensitive fields only say they changed
+    ip_address = db.Column(db.String(45), nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_audit_log_user_time', 'user_id', 'occurred_at'),
+        db.Index('ix_audit_log_entity_time', 'entity_type', 'entity_id', 'occurred_at'),
+        db.Index('ix_audit_log_time', 'occurred_at'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'occurred_at': self.occurred_at.isoformat() if self.occurred_at else None,
+            'user_id': self.user_id,
+            'action': self.action,
+            'entity_type': self.entity_type,
+            'entity_id': self.entity_id,
+            'changes': self.changes,
+            'ip_address': self.ip_address
+        }
@@ -0,0 +1,41 @@
+from src.database import db
+
+class BudgetLine(db.Model):
+    """What one budget report currently contributes to the rollups"""
+    __tablename__ = 'budget_lines'
+
+    id = db.Column(db.Integer, primary_key=True)
+    report_id = db.Column(db.Integer, db.ForeignKey('report.id', ondelete='CASCADE'), nullable=False, index=True)
+    month = db.Column(db.String(7), nullable=False)  # YYYY-MM
+    category = db.Column(db.String(100), nullable=False, default='')
+    created_by = db.Column(db.Integer, nullable=True)
+    budget = db.Column(db.Float, default=0)
+    spent = db.Column(db.Float, default=0)
+
+class BudgetRollup(db.Model):
+    """Running totals of budget lines per month, category and creator"""
+    __tablename__ = 'budget_rollups'
+
+    id = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.String(7), nullable=False)
+    category = db.Column(db.String(100), nullable=False, default='')
+    created_by = db.Column(db.Integer, nullable=True)
+    budget = db.Column(db.Float, default=0)
+    spent = db.Column(db.Float, default=0)
+    line_count = db.Column(db.Integer, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('month', 'category', 'created_by', name='unique_budget_rollup'),
+        db.Index('ix_budget_rollups_category_month', 'category', 'month'),
+    )
+
+    def to_dict(self):
+        return {
+            'month': self.month,
+            'category': self.category,
+            'created_by': self.created_by,
+            'budget': self.budget,
+            'spent': self.spent,
+            'remaining': (self.budget or 0) - (self.spent or 0),
+            'line_count': self.line_count
+        }
@@ -0,0 +1,49 @@
+from src.database import db, JSON
+from datetime import datetime
+import uuid
+
+class Job(db.Model):
+    __tablename__ = 'jobs'
+
+    id = db.Column(db.String(32), primary_key=True, default=lambda: uuid.uuid4().hex)
+    type = db.Column(db.String(50), nullable=False)  # export_reports, export_participants, email_report, ...
+    payload = db.Column(JSON, nullable=True)
+    status = db.Column(db.String(20), default='queued', index=True)  # queued, running, succeeded, failed
+    progress = db.Column(db.Integer, default=0)  # 0-100
+    attempts = db.Column(db.Integer, default=0)
+    max_attempts = db.Column(db.Integer, default=3)
+    run_after = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    locked_by = db.Column(db.String(64), nullable=True)  # worker that claimed the job
+    error = db.Column(db.Text, nullable=True)
+    result = db.Column(JSON, nullable=True)
+    artifact_path = db.Column(db.String(255), nullable=True)
+    artifact_name = db.Column(db.String(255), nullable=True)
+    artifact_type = db.Column(db.String(100), nullable=True)
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def is_finished(self):
+        """Check if the job reached a terminal state"""
+        return self.status in ('succeeded', 'failed')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'type': self.type,
+            'status': self.status,
+            'progress': self.progress,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'run_after': self.run_after.isoformat() if self.run_after else None,
+            'error': self.error,
+            'result': self.result,
+            'has_artifact': bool(self.artifact_path),
+            'artifact_name': self.artifact_name,
+            'created_by': self.created_by,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
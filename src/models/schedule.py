@@ -0,0 +1,20 @@
+from src.database import db
+
+class ActivitySlot(db.Model):
+    """One row per (activity, day) the activity's time interval covers.
+
+    Bucketing intervals by day turns overlap and calendar queries into index
+    range scans on (location_key, day) and (day).
+    """
+    __tablename__ = 'activity_slots'
+
+    activity_id = db.Column(db.Integer, db.ForeignKey('activities.id', ondelete='CASCADE'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    location_key = db.Column(db.String(200), nullable=True)  # normalized Activity.location
+    starts_at = db.Column(db.DateTime, nullable=False)
+    ends_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_activity_slots_location_day', 'location_key', 'day'),
+        db.Index('ix_activity_slots_day', 'day'),
+    )
@@ -0,0 +1,10 @@
+from datetime import datetime
+from src.database import db
+
+class SchemaStamp(db.Model):
+    """Schema version a database was last initialized with (see src.tenancy.ensure_schema)"""
+    __tablename__ = 'schema_stamp'
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.String(40), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -0,0 +1,38 @@
+from src.database import db
+from datetime import datetime
+import uuid
+
+class AuthSession(db.Model):
+    """A login session; its refresh token is rotated on every refresh"""
+    __tablename__ = 'auth_sessions'
+
+    id = db.Column(db.String(32), primary_key=True, default=lambda: uuid.uuid4().hex)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    refresh_jti = db.Column(db.String(36), nullable=True)  # only the latest refresh token is valid
+    user_agent = db.Column(db.String(255), nullable=True)
+    ip_address = db.Column(db.String(45), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_used_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=True)
+    revoked_at = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'user_agent': self.user_agent,
+            'ip_address': self.ip_address,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'last_used_at': self.last_used_at.isoformat() if self.last_used_at else None,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None,
+            'is_revoked': self.revoked_at is not None
+        }
+
+class Revocation(db.Model):
+    """Append-only log of revoked tokens, sessions and users, replayed by every worker"""
+    __tablename__ = 'revocations'
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(10), nullable=False)  # jti, session, user
+    key = db.Column(db.String(64), nullable=False)
+    revoked_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=True)  # after this the entry can be dropped
@@ -69,6 +69,8 @@ class Activity(db.Model):
     time = db.Column(db.Time, nullable=True)
     location = db.Column(db.String(200), nullable=True)
     max_participants = db.Column(db.Integer, nullable=True)
+    duration_minutes = db.Column(db.Integer, nullable=True)  # defaults to 2 hours when time is set, else all day
+    attendee_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # maintained by src.scheduling
     status = db.Column(db.String(20), default='planned')  # planned, ongoing, completed, cancelled
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -83,6 +85,8 @@ class Activity(db.Model):
             'time': self.time.isoformat() if self.time else None,
             'location': self.location,
             'max_participants': self.max_participants,
+            'duration_minutes': self.duration_minutes,
+            'attendee_count': self.attendee_count,
             'status': self.status,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
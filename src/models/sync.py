@@ -0,0 +1,16 @@
+from src.database import db
+from datetime import datetime
+
+class SyncTombstone(db.Model):
+    """Record of a hard-deleted row, so offline clients can drop their copy"""
+    __tablename__ = 'sync_tombstones'
+
+    id = db.Column(db.Integer, primary_key=True)
+    collection = db.Column(db.String(50), nullable=False)
+    object_id = db.Column(db.Integer, nullable=False)
+    owner_id = db.Column(db.Integer, nullable=True)  # for per-user collections such as notifications
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_sync_tombstones_collection_deleted_at', 'collection', 'deleted_at'),
+    )
@@ -0,0 +1,24 @@
+from datetime import datetime
+from src.database import db
+
+class Tenant(db.Model):
+    """A troop with its own database; rows live in the shared registry database"""
+    __bind_key__ = 'registry'
+    __tablename__ = 'tenants'
+
+    id = db.Column(db.Integer, primary_key=True)
+    slug = db.Column(db.String(63), unique=True, nullable=False)  # subdomain / JWT tenant claim
+    name = db.Column(db.String(200), nullable=False)
+    database_uri = db.Column(db.String(500), nullable=True)  # defaults to TENANT_DATABASE_DIR/<slug>.db
+    archive_uri = db.Column(db.String(500), nullable=True)
+    is_active = db.Column(db.Boolean, default=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'slug': self.slug,
+            'name': self.name,
+            'is_active': self.is_active,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
@@ -1,10 +1,11 @@
-from flask_sqlalchemy import SQLAlchemy
+from src.database import db, JSON
 from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime
-
-db = SQLAlchemy()
+from datetime import datetime, date
+from sqlalchemy import event
 
 class User(db.Model):
+    __tablename__ = 'users'
+
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
@@ -48,12 +49,14 @@ class User(db.Model):
         }
 
 class Report(db.Model):
+    __table_args__ = {'sqlite_autoincrement': True}  # ids of archived reports are never handed out again
+
     id = db.Column(db.Integer, primary_key=True)
     type = db.Column(db.String(20), nullable=False)  # budget, issue, schedule
     title = db.Column(db.String(200), nullable=False)
     content = db.Column(db.Text, nullable=True)
-    data = db.Column(db.JSON, nullable=True)  # Store structured data as JSON
-    created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    data = db.Column(JSON, nullable=True)  # Store structured data as JSON
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)
@@ -74,3 +77,91 @@ class Report(db.Model):
             'is_active': self.is_active
         }
 
+
+class ReportFact(db.Model):
+    """Hot fields extracted from Report.data so they can be filtered and aggregated in SQL.
+
+    One row per report, rewritten whenever the report is inserted or updated.
+    """
+    __tablename__ = 'report_facts'
+
+    report_id = db.Column(db.Integer, db.ForeignKey('report.id', ondelete='CASCADE'), primary_key=True)
+    type = db.Column(db.String(20), nullable=False)
+    is_active = db.Column(db.Boolean, default=True)
+    created_by = db.Column(db.Integer, nullable=True)
+    amount = db.Column(db.Float, nullable=True)  # budget: total budget
+    spent = db.Column(db.Float, nullable=True)  # budget: amount spent
+    due_date = db.Column(db.Date, nullable=True)  # schedule: event date, issue: report date
+    status = db.Column(db.String(50), nullable=True)
+    priority = db.Column(db.String(50), nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_report_facts_type_date', 'type', 'is_active', 'due_date'),
+        db.Index('ix_report_facts_type_status', 'type', 'is_active', 'status'),
+    )
+
+    @staticmethod
+    def extract(report_type, data):
+        """Pull the indexed fields out of a report's JSON payload"""
+        data = data if isinstance(data, dict) else {}
+        return {
+            'amount': _to_float(_first(data, 'totalBudget', 'total', 'amount')),
+            'spent': _to_float(data.get('spent')),
+            'due_date': _to_date(_first(data, 'due_date', 'dueDate', 'date')),
+            'status': _to_str(data.get('status')),
+            'priority': _to_str(data.get('priority'))
+        }
+
+    @classmethod
+    def values_for(cls, report):
+        values = cls.extract(report.type, report.data)
+        values.update(report_id=report.id, type=report.type, is_active=report.is_active,
+                      created_by=report.created_by)
+        return values
+
+    @classmethod
+    def rebuild(cls):
+        """Recompute every row from Report.data; returns the number of reports indexed"""
+        cls.query.delete()
+        count = 0
+        for report in Report.query.yield_per(500):
+            db.session.add(cls(**cls.values_for(report)))
+            count += 1
+        db.session.commit()
+        return count
+
+def _first(data, *keys):
+    for key in keys:
+        if data.get(key) not in (None, ''):
+            return data[key]
+    return None
+
+def _to_float(value):
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+def _to_date(value):
+    if not isinstance(value, str):
+        return None
+    try:
+        return date.fromisoformat(value[:10])
+    except ValueError:
+        return None
+
+def _to_str(value):
+    return str(value)[:50] if value is not None else None
+
+@event.listens_for(Report, 'after_insert')
+@event.listens_for(Report, 'after_update')
+def sync_report_facts(mapper, connection, report):
+    """Keep report_facts in step with Report.data inside the same transaction"""
+    table = ReportFact.__table__
+    connection.execute(table.delete().where(table.c.report_id == report.id))
+    connection.execute(table.insert().values(**ReportFact.values_for(report)))
+
+@event.listens_for(Report, 'after_delete')
+def delete_report_facts(mapper, connection, report):
+    table = ReportFact.__table__
+    connection.execute(table.delete().where(table.c.report_id == report.id))
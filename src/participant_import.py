@@ -0,0 +1,301 @@
+"""Streaming bulk import of participants from CSV or XLSX.
+
+Rows are read one at a time (csv.reader over the upload stream, openpyxl in
+read-only mode for XLSX), normalized, checked against an in-memory index of
+existing emails/phones and inserted in batches, so memory stays bounded
+regardless of file size. Headers may be English (as written by the
+participants export) or Arabic. CSV files are read as UTF-8, or as
+Windows-1256 (what Arabic Excel saves as "CSV") when they are not valid UTF-8.
+
+Each batch is committed on its own. If a batch fails, it is rolled back, the
+import stops and the summary of the batches already committed is returned
+with the error.
+"""
+import io
+import re
+import csv
+import codecs
+import unicodedata
+from datetime import date, datetime
+from src.database import db
+from src.models.settings import Participant
+from src import audit
+
+BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 1000
+CSV_ENCODINGS = ('utf-8-sig', 'cp1256')  # tried in order
+
+HEADER_ALIASES = {
+    'name': ('name', 'full name', 'الاسم', 'الاسم الكامل'),
+    'email': ('email', 'e-mail', 'البريد الإلكتروني', 'البريد الالكتروني', 'البريد'),
+    'phone': ('phone', 'mobile', 'الجوال', 'رقم الجوال', 'الهاتف', 'رقم الهاتف'),
+    'age': ('age', 'العمر'),
+    'join_date': ('join date', 'joined', 'تاريخ الانضمام'),
+    'status': ('status', 'الحالة'),
+    'role': ('role', 'الدور'),
+    'notes': ('notes', 'ملاحظات'),
+    'emergency_contact': ('emergency contact', 'جهة اتصال الطوارئ', 'ولي الأمر'),
+    'emergency_phone': ('emergency phone', 'هاتف الطوارئ', 'جوال ولي الأمر'),
+    'medical_info': ('medical info', 'المعلومات الطبية', 'معلومات طبية')
+}
+HEADER_LOOKUP = {alias: field for field, aliases in HEADER_ALIASES.items() for alias in aliases}
+
+# Arabic-Indic and Eastern Arabic-Indic digits to ASCII
+DIGITS = str.maketrans('٠١٢٣٤٥٦٧٨٩۰۱۲۳۴۵۶۷۸۹', '01234567890123456789')
+TATWEEL = 'ـ'
+EMAIL_PATTERN = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%Y/%m/%d')
+STATUSES = ('active', 'inactive', 'suspended')
+
+class ImportFormatError(ValueError):
+    """The uploaded file cannot be read as a participants sheet"""
+
+def normalize_name(value):
+    """NFC-normalize, drop tatweel and collapse whitespace"""
+    value = unicodedata.normalize('NFC', str(value)).replace(TATWEEL, '')
+    return ' '.join(value.split())
+
+def normalize_phone(value):
+    """Normalize Saudi numbers to +9665XXXXXXXX; other numbers keep their digits"""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)  # spreadsheet cells hold numbers as floats: 501234567.0
+    digits = re.sub(r'[^\d+]', '', str(value).translate(DIGITS))
+    if digits.startswith('00'):
+        digits = '+' + digits[2:]
+    if re.fullmatch(r'05\d{8}', digits):
+        return '+966' + digits[1:]
+    if re.fullmatch(r'5\d{8}', digits):
+        return '+966' + digits
+    if re.fullmatch(r'9665\d{8}', digits):
+        return '+' + digits
+    if re.fullmatch(r'\+\d{8,15}', digits) or re.fullmatch(r'\d{8,15}', digits):
+        return digits
+    raise ValueError('رقم الجوال غير صالح')
+
+def parse_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = str(value).translate(DIGITS).strip()
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, date_format).date()
+        except ValueError:
+            continue
+    raise ValueError('تاريخ الانضمام غير صالح')
+
+def normalize_row(raw):
+    """Turn a raw {field: cell} mapping into Participant column values or raise ValueError"""
+    values = {}
+    errors = []
+
+    def cell(field):
+        value = raw.get(field)
+        if value is None:
+            return None
+        if isinstance(value, str):
+            value = value.strip()
+            return value or None
+        return value
+
+    name = cell('name')
+    if not name:
+        errors.append('الاسم مطلوب')
+    else:
+        values['name'] = normalize_name(name)[:100]
+
+    email = cell('email')
+    if email:
+        email = str(email).lower()
+        if EMAIL_PATTERN.match(email):
+            values['email'] = email[:120]
+        else:
+            errors.append('البريد الإلكتروني غير صالح')
+
+    for field in ('phone', 'emergency_phone'):
+        if cell(field):
+            try:
+                values[field] = normalize_phone(cell(field))[:20]
+            except ValueError as e:
+                errors.append(str(e))
+
+    age = cell('age')
+    if age is not None:
+        try:
+            age = int(float(str(age).translate(DIGITS)))
+            if not 1 <= age <= 120:
+                raise ValueError
+            values['age'] = age
+        except ValueError:
+            errors.append('العمر غير صالح')
+
+    if cell('join_date'):
+        try:
+            values['join_date'] = parse_date(cell('join_date'))
+        except ValueError as e:
+            errors.append(str(e))
+
+    status = cell('status')
+    if status:
+        status = str(status).lower()
+        if status not in STATUSES:
+            errors.append('الحالة غير صالحة')
+        else:
+            values['status'] = status
+
+    for field, length in (('role', 50), ('emergency_contact', 100), ('notes', None), ('medical_info', None)):
+        if cell(field):
+            text = normalize_name(cell(field)) if field == 'emergency_contact' else str(cell(field))
+            values[field] = text[:length] if length else text
+
+    if errors:
+        raise ValueError('؛ '.join(errors))
+    return values
+
+def map_headers(header_row):
+    """Column index -> field for recognised headers"""
+    mapping = {}
+    for index, header in enumerate(header_row):
+        if header is None:
+            continue
+        key = ' '.join(str(header).replace('_', ' ').split()).lower()
+        field = HEADER_LOOKUP.get(key)
+        if field and field not in mapping.values():
+            mapping[index] = field
+    if 'name' not in mapping.values():
+        raise ImportFormatError('لم يتم العثور على عمود الاسم في الملف')
+    return mapping
+
+def detect_encoding(stream):
+    """First of CSV_ENCODINGS that decodes the whole stream; the stream is rewound"""
+    start = stream.tell()
+    for encoding in CSV_ENCODINGS:
+        decoder = codecs.getincrementaldecoder(encoding)()
+        try:
+            for chunk in iter(lambda: stream.read(64 * 1024), b''):
+                decoder.decode(chunk)
+            decoder.decode(b'', final=True)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+        finally:
+            stream.seek(start)
+    raise ImportFormatError('تعذر قراءة ترميز الملف، احفظه بصيغة CSV UTF-8')
+
+def iter_csv(stream):
+    encoding = detect_encoding(stream) if stream.seekable() else CSV_ENCODINGS[0]
+    text = io.TextIOWrapper(stream, encoding=encoding, newline='')
+    try:
+        yield from csv.reader(text)
+    except UnicodeDecodeError:
+        raise ImportFormatError('تعذر قراءة ترميز الملف، احفظه بصيغة CSV UTF-8')
+
+def iter_xlsx(stream):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImportFormatError('استيراد ملفات Excel غير متاح على هذا الخادم')
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        yield from workbook.worksheets[0].iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+def iter_records(stream, filename):
+    """Yield (row_number, {field: value}) for each data row"""
+    if filename.lower().endswith(('.xlsx', '.xlsm')):
+        rows = iter_xlsx(stream)
+    elif filename.lower().endswith(('.csv', '.txt')):
+        rows = iter_csv(stream)
+    else:
+        raise ImportFormatError('صيغة الملف غير مدعومة، استخدم CSV أو XLSX')
+
+    header = next(rows, None)
+    if header is None:
+        raise ImportFormatError('الملف فارغ')
+    mapping = map_headers(header)
+
+    for row_number, row in enumerate(rows, start=2):
+        if not any(cell not in (None, '') for cell in row):
+            continue
+        yield row_number, {field: row[index] for index, field in mapping.items() if index < len(row)}
+
+def existing_index():
+    """Emails and phones of existing participants, for de-duplication"""
+    emails, phones = set(), set()
+    for email, phone in db.session.query(Participant.email, Participant.phone).yield_per(5000):
+        if email:
+            emails.add(email.lower())
+        if phone:
+            try:
+                phones.add(normalize_phone(phone))
+            except ValueError:
+                phones.add(phone)
+    return emails, phones
+
+def import_participants(stream, filename, created_by=None, dry_run=False, batch_size=BATCH_SIZE):
+    """Import participants from an uploaded file and return a summary with per-row errors"""
+    emails, phones = existing_index()
+    summary = {'total_rows': 0, 'imported': 0, 'duplicates': 0, 'invalid': 0, 'errors': [], 'dry_run': dry_run}
+    batch = []
+    batch_rows = []  # file row numbers of the batch
+
+    def report(row_number, message):
+        if len(summary['errors']) < MAX_REPORTED_ERRORS:
+            summary['errors'].append({'row': row_number, 'error': message})
+
+    def flush():
+        if batch and not dry_run:
+            db.session.execute(Participant.__table__.insert(), batch)
+            db.session.commit()
+            # Core inserts skip the ORM audit hooks, so log each committed batch
+            audit.record('import', 'participants', None, {'file': filename, 'rows': len(batch),
+                         'first_row': batch_rows[0], 'last_row': batch_rows[-1]}, user_id=created_by)
+        summary['imported'] += len(batch)
+        batch.clear()
+        batch_rows.clear()
+
+    row_number = None
+    try:
+        for row_number, raw in iter_records(stream, filename):
+            summary['total_rows'] += 1
+            try:
+                values = normalize_row(raw)
+            except ValueError as e:
+                summary['invalid'] += 1
+                report(row_number, str(e))
+                continue
+
+            email, phone = values.get('email'), values.get('phone')
+            if (email and email in emails) or (phone and phone in phones):
+                summary['duplicates'] += 1
+                report(row_number, 'مشارك مسجل مسبقاً بنفس البريد الإلكتروني أو رقم الجوال')
+                continue
+            if email:
+                emails.add(email)
+            if phone:
+                phones.add(phone)
+
+            # executemany needs the same keys in every row
+            row = dict.fromkeys(HEADER_ALIASES)
+            row.update(values)
+            row['status'] = values.get('status', 'active')
+            row['created_by'] = created_by
+            batch.append(row)
+            batch_rows.append(row_number)
+            if len(batch) >= batch_size:
+                flush()
+
+        flush()
+    except ImportFormatError:
+        raise  # unreadable header or file type: nothing was imported
+    except Exception as e:
+        # Batches already committed stay imported; the failing one is dropped
+        db.session.rollback()
+        batch.clear()
+        batch_rows.clear()
+        summary['error'] = f'{type(e).__name__}: {e}'
+        summary['stopped_at_row'] = row_number
+    summary['errors_truncated'] = summary['duplicates'] + summary['invalid'] > len(summary['errors'])
+    return summary
@@ -0,0 +1,289 @@
+"""Retention policies: purge or archive old rows in small batches.
+
+Policies (ages are configurable, 0 disables a policy):
+- read notifications older than RETENTION_NOTIFICATION_DAYS (90) are purged
+- inactive comments untouched for RETENTION_COMMENT_DAYS (30) are purged,
+  leaves first so replies never point at a missing parent
+- inactive reports untouched for RETENTION_REPORT_DAYS (30) are moved, with
+  their comments, to the archive database (SQLALCHEMY_BINDS['archive'])
+- sync tombstones older than RETENTION_TOMBSTONE_DAYS (90) are purged; delta
+  sync sends clients with an older cursor a full resync instead
+
+Reports and comments use AUTOINCREMENT ids on SQLite, so a new row never
+takes the id of an archived one (ensure_autoincrement() converts databases
+created before that and moves the counters past the archived ids).
+
+Each batch of RETENTION_BATCH_SIZE rows is its own short transaction, with a
+RETENTION_PAUSE_SECONDS pause in between so other writers are never locked
+out for long. Hard-deleted rows of synced collections get sync tombstones.
+After a run that removed at least RETENTION_VACUUM_MIN_ROWS rows, SQLite
+databases in incremental auto_vacuum mode return the free pages to the file
+system a few hundred pages at a time.
+
+    python -m src.retention run [--dry-run]
+    python -m src.retention enable-vacuum    # one-off full VACUUM to switch an existing database over
+"""
+import sys
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import select, func, exists, true
+from sqlalchemy.orm import aliased
+from sqlalchemy.schema import CreateTable
+from src.database import db
+from src.models.user import User, Report, ReportFact
+from src.models.activation import Comment, CommentLike, Notification
+from src.models.budget import BudgetLine
+from src.models.sync import SyncTombstone
+from src.models.archive import ArchivedReport, ArchivedComment
+from src.sync import COLLECTIONS
+
+VACUUM_PAGES_PER_STEP = 500
+
+class RetentionPolicy:
+    def __init__(self, name, model, config_key, default_days, timestamp, condition, apply, action='purge'):
+        self.name = name
+        self.model = model
+        self.config_key = config_key
+        self.default_days = default_days
+        self.timestamp = timestamp
+        self.condition = condition  # callable returning the extra WHERE clause
+        self.apply = apply  # callable(ids) removing one batch
+        self.action = action
+
+    def days(self, config):
+        return int(config.get(self.config_key, self.default_days) or 0)
+
+    def candidates(self, cutoff):
+        return (select(self.model.id)
+                .where(self.condition(), self.timestamp < cutoff)
+                .order_by(self.model.id))
+
+    def run(self, config, dry_run=False, pause=None):
+        days = self.days(config)
+        result = {'policy': self.name, 'action': self.action, 'days': days, 'rows': 0}
+        if not days:
+            result['disabled'] = True
+            return result
+
+        cutoff = datetime.utcnow() - timedelta(days=days)
+        result['cutoff'] = cutoff.isoformat()
+        if dry_run:
+            result['rows'] = db.session.execute(
+                select(func.count()).select_from(self.candidates(cutoff).subquery())).scalar()
+            return result
+
+        batch_size = config.get('RETENTION_BATCH_SIZE', 500)
+        pause = config.get('RETENTION_PAUSE_SECONDS', 0.05) if pause is None else pause
+        while True:
+            ids = db.session.execute(self.candidates(cutoff).limit(batch_size)).scalars().all()
+            db.session.commit()  # end the read transaction before writing
+            if not ids:
+                break
+            self.apply(ids)
+            result['rows'] += len(ids)
+            if pause:
+                time.sleep(pause)
+        return result
+
+def record_tombstones(collection_name, ids):
+    """Tell delta-sync clients about rows removed behind the ORM's back"""
+    collection = COLLECTIONS[collection_name]
+    table = collection.model.__table__
+    owner = table.c[collection.owner.key] if collection.owner is not None else None
+    columns = [table.c.id] + ([owner] if owner is not None else [])
+    now = datetime.utcnow()
+    rows = [{'collection': collection_name, 'object_id': row[0],
+             'owner_id': row[1] if owner is not None else None, 'deleted_at': now}
+            for row in db.session.execute(select(*columns).where(table.c.id.in_(ids)))]
+    if rows:
+        db.session.execute(SyncTombstone.__table__.insert(), rows)
+
+def purge_notifications(ids):
+    record_tombstones('notifications', ids)
+    db.session.execute(Notification.__table__.delete().where(Notification.id.in_(ids)))
+    db.session.commit()
+
+def purge_comments(ids):
+    db.session.execute(CommentLike.__table__.delete().where(CommentLike.comment_id.in_(ids)))
+    db.session.execute(Comment.__table__.delete().where(Comment.id.in_(ids)))
+    db.session.commit()
+
+def archive_reports(ids):
+    """Copy reports and their comments to the archive, then delete them here.
+
+    The archive write commits first and replaces any earlier copy, so a run
+    interrupted between the two steps is simply repeated by the next one.
+    """
+    reports = Report.__table__
+    comments = Comment.__table__
+    users = User.__table__
+
+    report_rows = db.session.execute(
+        select(reports, users.c.username.label('creator_name'))
+        .outerjoin(users, users.c.id == reports.c.created_by)
+        .where(reports.c.id.in_(ids))
+    ).mappings().all()
+    comment_rows = db.session.execute(
+        select(comments, users.c.username.label('user_name'))
+        .outerjoin(users, users.c.id == comments.c.user_id)
+        .where(comments.c.report_id.in_(ids))
+    ).mappings().all()
+    comment_ids = [row['id'] for row in comment_rows]
+
+    archived_at = datetime.utcnow()
+    with db.engines['archive'].begin() as archive:
+        archive.execute(ArchivedComment.__table__.delete().where(ArchivedComment.report_id.in_(ids)))
+        archive.execute(ArchivedReport.__table__.delete().where(ArchivedReport.id.in_(ids)))
+        archive.execute(ArchivedReport.__table__.insert(), [dict(row, archived_at=archived_at) for row in report_rows])
+        if comment_rows:
+            archive.execute(ArchivedComment.__table__.insert(), [dict(row) for row in comment_rows])
+
+    record_tombstones('reports', ids)
+    if comment_ids:
+        db.session.execute(CommentLike.__table__.delete().where(CommentLike.comment_id.in_(comment_ids)))
+        db.session.execute(comments.delete().where(comments.c.id.in_(comment_ids)))
+    db.session.execute(ReportFact.__table__.delete().where(ReportFact.report_id.in_(ids)))
+    db.session.execute(BudgetLine.__table__.delete().where(BudgetLine.report_id.in_(ids)))
+    db.session.execute(reports.delete().where(reports.c.id.in_(ids)))
+    db.session.commit()
+
+def ensure_autoincrement():
+    """Rebuild SQLite tables created without AUTOINCREMENT and keep their ids ahead of the archive.
+
+    Returns the names of the tables that were rebuilt.
+    """
+    engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return []  # PostgreSQL sequences never hand an id out twice
+    archived = {
+        Report.__table__: db.session.query(func.max(ArchivedReport.id)).scalar() or 0,
+        Comment.__table__: db.session.query(func.max(ArchivedComment.id)).scalar() or 0,
+    }
+    rebuilt = []
+    with engine.begin() as connection:
+        for table, archived_max in archived.items():
+            sql = connection.exec_driver_sql('SELECT sql FROM sqlite_master WHERE type = ? AND name = ?',
+                                             ('table', table.name)).scalar()
+            if 'AUTOINCREMENT' not in sql.upper():
+                # Copy into a new table and swap it in; renaming the old one would retarget foreign keys
+                staging = f'_{table.name}_rebuild'
+                ddl = str(CreateTable(table).compile(dialect=connection.dialect))
+                connection.exec_driver_sql(ddl.replace(f'CREATE TABLE {table.name} ', f'CREATE TABLE "{staging}" ', 1))
+                columns = ', '.join(f'"{column.name}"' for column in table.columns)
+                connection.exec_driver_sql(f'INSERT INTO "{staging}" ({columns}) SELECT {columns} FROM "{table.name}"')
+                connection.exec_driver_sql(f'DROP TABLE "{table.name}"')
+                connection.exec_driver_sql(f'ALTER TABLE "{staging}" RENAME TO "{table.name}"')
+                for index in table.indexes:
+                    index.create(connection, checkfirst=True)
+                rebuilt.append(table.name)
+
+            current = connection.execute(select(func.max(table.c.id))).scalar() or 0
+            sequence = connection.exec_driver_sql('SELECT seq FROM sqlite_sequence WHERE name = ?', (table.name,)).scalar()
+            if sequence is None:
+                connection.exec_driver_sql('INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)',
+                                           (table.name, max(current, archived_max)))
+            elif sequence < archived_max:
+                connection.exec_driver_sql('UPDATE sqlite_sequence SET seq = ? WHERE name = ?', (archived_max, table.name))
+    return rebuilt
+
+def purge_tombstones(ids):
+    db.session.execute(SyncTombstone.__table__.delete().where(SyncTombstone.id.in_(ids)))
+    db.session.commit()
+
+def _leaf_comment():
+    replies = aliased(Comment)
+    return (Comment.is_active == False) & ~exists().where(replies.parent_id == Comment.id)
+
+POLICIES = [
+    RetentionPolicy('read_notifications', Notification, 'RETENTION_NOTIFICATION_DAYS', 90,
+                    Notification.created_at, lambda: Notification.is_read == True, purge_notifications),
+    RetentionPolicy('inactive_comments', Comment, 'RETENTION_COMMENT_DAYS', 30,
+                    Comment.updated_at, _leaf_comment, purge_comments),
+    RetentionPolicy('inactive_reports', Report, 'RETENTION_REPORT_DAYS', 30,
+                    Report.updated_at, lambda: Report.is_active == False, archive_reports, action='archive'),
+    RetentionPolicy('sync_tombstones', SyncTombstone, 'RETENTION_TOMBSTONE_DAYS', 90,
+                    SyncTombstone.deleted_at, true, purge_tombstones),
+]
+
+def run(config=None, dry_run=False, progress=None):
+    """Apply every policy; returns one result dict per policy"""
+    config = config if config is not None else current_app.config
+    results = []
+    for index, policy in enumerate(POLICIES):
+        results.append(policy.run(config, dry_run=dry_run))
+        if progress:
+            progress(index + 1, len(POLICIES))
+
+    removed = sum(result['rows'] for result in results)
+    if not dry_run and removed >= config.get('RETENTION_VACUUM_MIN_ROWS', 1000):
+        incremental_vacuum(db.engine, pause=config.get('RETENTION_PAUSE_SECONDS', 0.05))
+    return results
+
+def find_report(report_id):
+    """Read-through lookup: the live report if it exists, else its archived copy"""
+    report = db.session.get(Report, report_id)
+    if report is not None:
+        return report
+    return db.session.get(ArchivedReport, report_id)
+
+def archived_comments(report_id):
+    return (ArchivedComment.query.filter_by(report_id=report_id)
+            .order_by(ArchivedComment.created_at, ArchivedComment.id).all())
+
+# SQLite space reclamation
+
+def _auto_vacuum_mode(connection):
+    return connection.exec_driver_sql('PRAGMA auto_vacuum').scalar()
+
+def enable_incremental_vacuum(engine):
+    """Switch a SQLite database to auto_vacuum=INCREMENTAL; returns True if it changed.
+
+    Cheap for an empty database; on an existing one this is a full VACUUM.
+    """
+    if engine.dialect.name != 'sqlite':
+        return False
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        if _auto_vacuum_mode(connection) == 2:
+            return False
+        connection.exec_driver_sql('PRAGMA auto_vacuum = INCREMENTAL')
+        connection.exec_driver_sql('VACUUM')
+        return _auto_vacuum_mode(connection) == 2
+
+def incremental_vacuum(engine, pages_per_step=VACUUM_PAGES_PER_STEP, pause=0.05):
+    """Release free pages in short steps; returns the number of pages freed (None if unsupported)"""
+    if engine.dialect.name != 'sqlite':
+        return None
+    freed = 0
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        if _auto_vacuum_mode(connection) != 2:
+            current_app.logger.info('Skipping incremental vacuum: run "python -m src.retention enable-vacuum" once')
+            return None
+        free_pages = connection.exec_driver_sql('PRAGMA freelist_count').scalar()
+        while free_pages:
+            connection.exec_driver_sql(f'PRAGMA incremental_vacuum({min(free_pages, pages_per_step)})')
+            remaining = connection.exec_driver_sql('PRAGMA freelist_count').scalar()
+            if remaining >= free_pages:
+                break
+            freed += free_pages - remaining
+            free_pages = remaining
+            if pause:
+                time.sleep(pause)
+    return freed
+
+if __name__ == '__main__':
+    command = sys.argv[1:2]
+    if command not in (['run'], ['enable-vacuum']):
+        sys.exit('usage: python -m src.retention run [--dry-run] | enable-vacuum')
+    from src.main import app
+    from src.tenancy import tenant_slugs, tenant_context
+    with app.app_context():
+        for tenant in tenant_slugs():
+            with tenant_context(tenant):
+                if command == ['enable-vacuum']:
+                    changed = enable_incremental_vacuum(db.engine)
+                    print(f"{tenant}: {'incremental vacuum enabled' if changed else 'nothing to do'}")
+                else:
+                    for result in run(dry_run='--dry-run' in sys.argv):
+                        print(f"{tenant}: {result['policy']}: {result['action']} {result['rows']} rows"
+                              + (' (disabled)' if result.get('disabled') else ''))
@@ -0,0 +1,50 @@
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required
+from datetime import datetime, timedelta, timezone
+from src.audit import audit_log, query, parse_cursor, format_cursor, MAX_LIMIT
+from src.tenancy import current_tenant
+from src.routes.sharing import require_permission
+
+audit_bp = Blueprint('audit', __name__)
+
+def parse_time_arg(name, end=False):
+    """ISO date or datetime argument as naive UTC; a bare end date includes the whole day"""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'Invalid time for {name}, expected YYYY-MM-DD or an ISO 8601 datetime')
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    if end and len(value) == 10:
+        moment += timedelta(days=1)
+    return moment
+
+@audit_bp.route('/api/audit', methods=['GET'])
+@jwt_required()
+@require_permission('admin')
+def get_audit_log():
+    """Audit events by user, entity, action and time range, newest first"""
+    try:
+        since = parse_time_arg('from')
+        until = parse_time_arg('to', end=True)
+        before = parse_cursor(request.args['before']) if request.args.get('before') else None
+        user_id = request.args.get('user_id', type=int)
+        limit = request.args.get('limit', 100, type=int)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        audit_log.flush(current_app, current_tenant())  # include events still waiting in this worker
+    except Exception:
+        current_app.logger.exception('Audit log flush failed')
+
+    events = query(user_id=user_id, entity_type=request.args.get('entity_type'),
+                   entity_id=request.args.get('entity_id'), action=request.args.get('action'),
+                   since=since, until=until, before=before, limit=limit)
+    return jsonify({
+        'events': events,
+        'next_before': format_cursor(events[-1]) if len(events) == min(max(limit, 1), MAX_LIMIT) else None
+    })
@@ -1,6 +1,8 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, get_current_user
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required, get_current_user, get_jwt
 from src.models.user import db, User
+from src.models.session import AuthSession
+from src.sessions import start_session, rotate_session, revoke_session, revoke_token, jwt_user_id
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -23,10 +25,11 @@ def login():
         if not user.is_active:
             return jsonify({'error': 'الحساب غير مفعل'}), 401
 
-        access_token = create_access_token(identity=user)
+        access_token, refresh_token = start_session(current_app, user)
         
         return jsonify({
             'access_token': access_token,
+            'refresh_token': refresh_token,
             'user': user.to_dict(),
             'message': 'تم تسجيل الدخول بنجاح'
         }), 200
@@ -68,10 +71,11 @@ def register():
         db.session.add(new_user)
         db.session.commit()
 
-        access_token = create_access_token(identity=new_user)
+        access_token, refresh_token = start_session(current_app, new_user)
 
         return jsonify({
             'access_token': access_token,
+            'refresh_token': refresh_token,
             'user': new_user.to_dict(),
             'message': 'تم إنشاء الحساب بنجاح'
         }), 201
@@ -80,6 +84,77 @@ def register():
         db.session.rollback()
         return jsonify({'error': 'حدث خطأ في الخادم'}), 500
 
+@auth_bp.route('/refresh', methods=['POST'])
+@jwt_required(refresh=True)
+def refresh():
+    """Rotate the refresh token and issue a new access token"""
+    try:
+        tokens, error = rotate_session(current_app, get_jwt())
+        if error:
+            return jsonify({'error': error}), 401
+
+        access_token, refresh_token = tokens
+        return jsonify({
+            'access_token': access_token,
+            'refresh_token': refresh_token
+        }), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'حدث خطأ في الخادم'}), 500
+
+@auth_bp.route('/logout', methods=['POST'])
+@jwt_required()
+def logout():
+    """Revoke the current access token and its session"""
+    try:
+        payload = get_jwt()
+        revoke_token(payload)
+        session = AuthSession.query.get(payload.get('sid')) if payload.get('sid') else None
+        if session and session.revoked_at is None:
+            revoke_session(session)
+        db.session.commit()
+        return jsonify({'message': 'تم تسجيل الخروج بنجاح'}), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'حدث خطأ في الخادم'}), 500
+
+@auth_bp.route('/sessions', methods=['GET'])
+@jwt_required()
+def get_sessions():
+    """List active sessions of the current user"""
+    try:
+        current_user_id = jwt_user_id()
+        sessions = (AuthSession.query
+                    .filter_by(user_id=current_user_id, revoked_at=None)
+                    .order_by(AuthSession.last_used_at.desc())
+                    .all())
+        current_session = get_jwt().get('sid')
+        return jsonify({
+            'sessions': [dict(session.to_dict(), current=session.id == current_session) for session in sessions]
+        }), 200
+    except Exception as e:
+        return jsonify({'error': 'حدث خطأ في الخادم'}), 500
+
+@auth_bp.route('/sessions/<session_id>', methods=['DELETE'])
+@jwt_required()
+def delete_session(session_id):
+    """Sign out one of the current user's sessions"""
+    try:
+        session = AuthSession.query.get(session_id)
+        if not session or session.user_id != jwt_user_id():
+            return jsonify({'error': 'الجلسة غير موجودة'}), 404
+
+        if session.revoked_at is None:
+            revoke_session(session)
+            db.session.commit()
+        return jsonify({'message': 'تم إنهاء الجلسة بنجاح'}), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'حدث خطأ في الخادم'}), 500
+
 @auth_bp.route('/profile', methods=['GET'])
 @jwt_required()
 def get_profile():
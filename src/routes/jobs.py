@@ -0,0 +1,61 @@
+from flask import Blueprint, jsonify, send_file
+from flask_jwt_extended import jwt_required
+import os
+from src.models.user import User
+from src.models.job import Job
+from src.serialization import serialize, requested_fields, json_response
+from src.sessions import jwt_user_id
+
+jobs_bp = Blueprint('jobs', __name__)
+
+def get_accessible_job(job_id):
+    """Return the job if the current user owns it (or is admin), else an error response"""
+    current_user_id = jwt_user_id()
+    job = Job.query.get(job_id)
+    if not job:
+        return None, (jsonify({'error': 'Job not found'}), 404)
+
+    user = User.query.get(current_user_id)
+    if not user or (job.created_by != current_user_id and not user.has_permission('admin')):
+        return None, (jsonify({'error': 'Access denied'}), 403)
+    return job, None
+
+@jobs_bp.route('/api/jobs', methods=['GET'])
+@jwt_required()
+def get_jobs():
+    """Get recent jobs created by current user"""
+    current_user_id = jwt_user_id()
+    jobs = (Job.query.filter_by(created_by=current_user_id)
+            .order_by(Job.created_at.desc())
+            .limit(50)
+            .all())
+    return json_response(serialize(jobs, fields=requested_fields()))
+
+@jobs_bp.route('/api/jobs/<job_id>', methods=['GET'])
+@jwt_required()
+def get_job(job_id):
+    """Get job status and progress"""
+    job, error = get_accessible_job(job_id)
+    if error:
+        return error
+
+    job_dict = job.to_dict()
+    if job.status == 'succeeded' and job.artifact_path:
+        job_dict['download_url'] = f'/api/jobs/{job.id}/download'
+    return jsonify(job_dict)
+
+@jobs_bp.route('/api/jobs/<job_id>/download', methods=['GET'])
+@jwt_required()
+def download_job_artifact(job_id):
+    """Download the file produced by a finished job"""
+    job, error = get_accessible_job(job_id)
+    if error:
+        return error
+
+    if job.status != 'succeeded' or not job.artifact_path:
+        return jsonify({'error': 'Job has no downloadable result yet', 'status': job.status}), 409
+    if not os.path.exists(job.artifact_path):
+        return jsonify({'error': 'Job result is no longer available'}), 410
+
+    return send_file(job.artifact_path, mimetype=job.artifact_type,
+                     as_attachment=True, download_name=job.artifact_name)
@@ -0,0 +1,163 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required
+from datetime import date
+import re
+from sqlalchemy import func
+from src.models.user import User, Report, ReportFact
+from src.serialization import serialize, requested_fields, json_response
+from src.budget import GROUP_COLUMNS, query_rollups
+from src.jobs import enqueue
+from src.routes.sharing import require_permission, job_accepted
+from src.sessions import jwt_user_id
+
+report_data_bp = Blueprint('report_data', __name__)
+
+MONTH_PATTERN = re.compile(r'^\d{4}-\d{2}$')
+
+def parse_date_arg(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'Invalid date for {name}, expected YYYY-MM-DD')
+
+def parse_float_arg(name):
+    value = request.args.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f'Invalid number for {name}')
+
+def parse_int_arg(name):
+    value = request.args.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f'Invalid integer for {name}')
+
+def filter_facts(report_type, query=None):
+    """Filter a query over report_facts (or joined to it) by the request's query parameters
+
+    Non-admins only see their own reports, as with exports.
+    """
+    if query is None:
+        query = ReportFact.query
+    query = query.filter(ReportFact.type == report_type, ReportFact.is_active == True)
+
+    current_user_id = jwt_user_id()
+    user = User.query.get(current_user_id)
+    if not user or not user.has_permission('admin'):
+        query = query.filter(ReportFact.created_by == current_user_id)
+
+    date_from = parse_date_arg('from')
+    date_to = parse_date_arg('to')
+    min_amount = parse_float_arg('min_amount')
+    max_amount = parse_float_arg('max_amount')
+    created_by = parse_int_arg('created_by')
+
+    if date_from:
+        query = query.filter(ReportFact.due_date >= date_from)
+    if date_to:
+        query = query.filter(ReportFact.due_date <= date_to)
+    if min_amount is not None:
+        query = query.filter(ReportFact.amount >= min_amount)
+    if max_amount is not None:
+        query = query.filter(ReportFact.amount <= max_amount)
+    if request.args.get('status'):
+        query = query.filter(ReportFact.status == request.args['status'])
+    if created_by is not None:
+        query = query.filter(ReportFact.created_by == created_by)
+    return query
+
+def matching_reports(report_type, order_by):
+    limit = min(request.args.get('limit', 100, type=int), 1000)
+    offset = request.args.get('offset', 0, type=int)
+    query = Report.query.join(ReportFact, ReportFact.report_id == Report.id)
+    return filter_facts(report_type, query).order_by(*order_by).limit(limit).offset(offset).all()
+
+@report_data_bp.route('/api/reports/budget/search', methods=['GET'])
+@jwt_required()
+def search_budget_reports():
+    """Filter budget reports and aggregate their totals in SQL"""
+    try:
+        facts = filter_facts('budget')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    count, total_budget, total_spent = facts.with_entities(
+        func.count(ReportFact.report_id),
+        func.coalesce(func.sum(ReportFact.amount), 0),
+        func.coalesce(func.sum(ReportFact.spent), 0)
+    ).one()
+
+    by_status = dict(facts.with_entities(ReportFact.status, func.count(ReportFact.report_id))
+                     .group_by(ReportFact.status).all())
+
+    reports = matching_reports('budget', (ReportFact.due_date.desc(), Report.id.desc()))
+    return json_response({
+        'reports': serialize(reports, fields=requested_fields()),
+        'totals': {
+            'count': count,
+            'total_budget': total_budget,
+            'total_spent': total_spent,
+            'remaining': total_budget - total_spent,
+            'by_status': {status or '': n for status, n in by_status.items()}
+        }
+    })
+
+@report_data_bp.route('/api/reports/schedule/search', methods=['GET'])
+@jwt_required()
+def search_schedule_reports():
+    """Schedule reports in a date range, ordered by event date"""
+    try:
+        facts = filter_facts('schedule')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    count = facts.count()
+    reports = matching_reports('schedule', (ReportFact.due_date, Report.id))
+    return json_response({
+        'reports': serialize(reports, fields=requested_fields()),
+        'count': count
+    })
+
+@report_data_bp.route('/api/reports/budget/rollups', methods=['GET'])
+@jwt_required()
+def get_budget_rollups():
+    """Budget totals over a month range from the incremental rollups"""
+    group_by = [g for g in request.args.get('group_by', 'month').split(',') if g]
+    if any(g not in GROUP_COLUMNS for g in group_by):
+        return jsonify({'error': f'group_by must be one of {", ".join(GROUP_COLUMNS)}'}), 400
+
+    for name in ('from', 'to'):
+        value = request.args.get(name)
+        if value and not MONTH_PATTERN.match(value):
+            return jsonify({'error': f'Invalid month for {name}, expected YYYY-MM'}), 400
+    try:
+        created_by = parse_int_arg('created_by')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return json_response({
+        'rollups': query_rollups(
+            month_from=request.args.get('from'),
+            month_to=request.args.get('to'),
+            category=request.args.get('category'),
+            created_by=created_by,
+            group_by=group_by
+        )
+    })
+
+@report_data_bp.route('/api/reports/budget/rollups/rebuild', methods=['POST'])
+@jwt_required()
+@require_permission('admin')
+def rebuild_budget_rollups():
+    """Queue a full rebuild of the budget rollups"""
+    job = enqueue('rebuild_budget_rollups', created_by=jwt_user_id())
+    return job_accepted(job, 'Rollup rebuild queued')
@@ -0,0 +1,45 @@
+from flask import Blueprint, jsonify, current_app
+from flask_jwt_extended import jwt_required
+from src.models.user import User
+from src.models.archive import ArchivedReport
+from src.retention import run, find_report, archived_comments
+from src.jobs import enqueue
+from src.routes.sharing import require_permission, job_accepted
+from src.sessions import jwt_user_id
+
+retention_bp = Blueprint('retention', __name__)
+
+@retention_bp.route('/api/reports/<int:report_id>/archived', methods=['GET'])
+@jwt_required()
+def get_report_with_archive(report_id):
+    """Get a report, falling back to the archive once retention has moved it"""
+    current_user_id = jwt_user_id()
+    report = find_report(report_id)
+    if report is None:
+        return jsonify({'error': 'Report not found'}), 404
+
+    user = User.query.get(current_user_id)
+    if not user.has_permission('admin') and report.created_by != current_user_id:
+        return jsonify({'error': 'Access denied'}), 403
+
+    result = report.to_dict()
+    if isinstance(report, ArchivedReport):
+        result['comments'] = [comment.to_dict() for comment in archived_comments(report_id)]
+    else:
+        result['archived'] = False
+    return jsonify({'report': result})
+
+@retention_bp.route('/api/retention', methods=['GET'])
+@jwt_required()
+@require_permission('admin')
+def preview_retention():
+    """How many rows each retention policy would remove now"""
+    return jsonify({'policies': run(current_app.config, dry_run=True)})
+
+@retention_bp.route('/api/retention/run', methods=['POST'])
+@jwt_required()
+@require_permission('admin')
+def run_retention():
+    """Queue a retention run"""
+    job = enqueue('apply_retention', created_by=jwt_user_id())
+    return job_accepted(job, 'Retention run queued')
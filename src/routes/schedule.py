@@ -0,0 +1,127 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required
+from datetime import date, time, timedelta
+from sqlalchemy.exc import IntegrityError
+from src.models.user import db
+from src.models.settings import Activity, Attendance, Participant
+from src.scheduling import activity_interval, find_conflicts, calendar, CapacityError
+from src.serialization import serialize, requested_fields, json_response
+from src.routes.report_data import parse_date_arg
+from src.routes.sharing import require_permission
+from src.sessions import jwt_user_id
+
+schedule_bp = Blueprint('schedule', __name__)
+
+MAX_CALENDAR_DAYS = 93
+WEEK_START = 6  # Sunday
+
+def calendar_range():
+    """(from, to) for ?view=month|week&date=..., or an explicit ?from=&to= range"""
+    date_from, date_to = parse_date_arg('from'), parse_date_arg('to')
+    if date_from or date_to:
+        if not (date_from and date_to):
+            raise ValueError('Both from and to are required')
+    else:
+        anchor = parse_date_arg('date') or date.today()
+        view = request.args.get('view', 'month')
+        if view == 'month':
+            date_from = anchor.replace(day=1)
+            date_to = (date_from + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        elif view == 'week':
+            date_from = anchor - timedelta(days=(anchor.weekday() - WEEK_START) % 7)
+            date_to = date_from + timedelta(days=6)
+        else:
+            raise ValueError('view must be month or week')
+
+    if date_to < date_from:
+        raise ValueError('to must not be before from')
+    if (date_to - date_from).days >= MAX_CALENDAR_DAYS:
+        raise ValueError(f'Calendar range is limited to {MAX_CALENDAR_DAYS} days')
+    return date_from, date_to
+
+@schedule_bp.route('/api/activities/calendar', methods=['GET'])
+@jwt_required()
+def get_calendar():
+    """Activities in a month, week or date range, with the days each one covers"""
+    try:
+        date_from, date_to = calendar_range()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    activities, days = calendar(date_from, date_to, request.args.get('location'))
+    return json_response({
+        'from': date_from.isoformat(),
+        'to': date_to.isoformat(),
+        'activities': serialize(activities, fields=requested_fields()),
+        'days': days
+    })
+
+@schedule_bp.route('/api/activities/conflicts', methods=['GET'])
+@jwt_required()
+def get_conflicts():
+    """Activities at a location that overlap a proposed date, time and duration"""
+    try:
+        activity_date = parse_date_arg('date')
+        if not activity_date:
+            raise ValueError('date is required')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        activity_time = time.fromisoformat(request.args['time']) if request.args.get('time') else None
+    except ValueError:
+        return jsonify({'error': 'Invalid time, expected HH:MM'}), 400
+    duration = request.args.get('duration_minutes', type=int)
+    exclude_id = request.args.get('exclude_id', type=int)
+
+    starts_at, ends_at = activity_interval(activity_date, activity_time, duration)
+    conflicts = find_conflicts(request.args.get('location'), starts_at, ends_at, exclude_id)
+    return json_response({
+        'starts_at': starts_at.isoformat(),
+        'ends_at': ends_at.isoformat(),
+        'conflicts': serialize(conflicts, fields=requested_fields())
+    })
+
+@schedule_bp.route('/api/activities/<int:activity_id>/attendance', methods=['POST'])
+@jwt_required()
+@require_permission('leader')
+def record_attendance(activity_id):
+    """Record a participant's attendance, refusing it once the activity is full"""
+    current_user_id = jwt_user_id()
+    activity = Activity.query.get_or_404(activity_id)
+    data = request.get_json() or {}
+
+    participant = Participant.query.get(data.get('participant_id'))
+    if not participant:
+        return jsonify({'error': 'Participant not found'}), 404
+    if data.get('status', 'present') not in ('present', 'absent', 'late', 'excused'):
+        return jsonify({'error': 'Invalid attendance status'}), 400
+
+    existing = Attendance.query.filter_by(activity_id=activity.id, participant_id=participant.id).first()
+    if existing:
+        return jsonify({'error': 'Attendance already recorded', 'attendance': existing.to_dict()}), 409
+
+    try:
+        record = Attendance(
+            activity_id=activity.id,
+            participant_id=participant.id,
+            status=data.get('status', 'present'),
+            notes=data.get('notes'),
+            recorded_by=current_user_id
+        )
+        db.session.add(record)
+        db.session.commit()
+    except CapacityError:
+        db.session.rollback()
+        return jsonify({
+            'error': 'Activity is full',
+            'max_participants': activity.max_participants
+        }), 409
+    except IntegrityError:
+        db.session.rollback()  # recorded concurrently by another request
+        return jsonify({'error': 'Attendance already recorded'}), 409
+
+    return jsonify({
+        'attendance': record.to_dict(),
+        'attendee_count': activity.attendee_count,
+        'max_participants': activity.max_participants
+    }), 201
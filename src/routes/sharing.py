@@ -1,13 +1,13 @@
-from flask import Blueprint, request, jsonify, make_response, send_file
-from flask_jwt_extended import jwt_required, get_jwt_identity
-import json
-import csv
-import io
+from flask import Blueprint, request, jsonify, make_response
+from flask_jwt_extended import jwt_required
 import uuid
 from datetime import datetime, timedelta
 from src.database import db
 from src.models.user import User, Report
-from src.models.settings import Participant, Activity, Attendance
+from src.jobs import enqueue
+from src.participant_import import import_participants as run_participant_import, ImportFormatError
+from src.sessions import jwt_user_id
+from src.tenancy import current_tenant, tenant_context
 
 sharing_bp = Blueprint('sharing', __name__)
 
@@ -17,7 +17,7 @@ shared_links = {}
 def require_permission(required_role):
     def decorator(f):
         def wrapper(*args, **kwargs):
-            current_user_id = get_jwt_identity()
+            current_user_id = jwt_user_id()
             user = User.query.get(current_user_id)
             if not user or not user.has_permission(required_role):
                 return jsonify({'error': 'Insufficient permissions'}), 403
@@ -32,7 +32,7 @@ def require_permission(required_role):
 @require_permission('leader')
 def create_share_link(report_id):
     """Create a shareable link for a report"""
-    current_user_id = get_jwt_identity()
+    current_user_id = jwt_user_id()
     report = Report.query.get_or_404(report_id)
     
     # Check if user can share this report
@@ -51,6 +51,7 @@ def create_share_link(report_id):
     # Store share link info
     shared_links[share_token] = {
         'type': 'report',
+        'tenant': current_tenant(),  # the token alone says nothing about the troop
         'report_id': report_id,
         'created_by': current_user_id,
         'expires_at': expires_at,
@@ -100,13 +101,19 @@ def access_shared_content(share_token):
     
     # Return content based on type
     if share_info['type'] == 'report':
-        report = Report.query.get(share_info['report_id'])
-        if not report:
+        # Read from the troop that created the link, not the one this request routes to
+        try:
+            with tenant_context(share_info['tenant']):
+                report = db.session.get(Report, share_info['report_id'])
+                data = report.to_dict() if report else None
+        except LookupError:
+            data = None  # the troop has been deactivated
+        if data is None:
             return jsonify({'error': 'Report not found'}), 404
         
         return jsonify({
             'type': 'report',
-            'data': report.to_dict(),
+            'data': data,
             'access_info': {
                 'access_count': share_info['access_count'],
                 'max_access': share_info['max_access'],
@@ -117,156 +124,75 @@ def access_shared_content(share_token):
     return jsonify({'error': 'Unknown content type'}), 400
 
 # Export Routes
+def job_accepted(job, message):
+    return jsonify({
+        'message': message,
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': f'/api/jobs/{job.id}'
+    }), 202
+
 @sharing_bp.route('/api/reports/export', methods=['POST'])
 @jwt_required()
 @require_permission('leader')
 def export_reports():
-    """Export reports in various formats"""
-    current_user_id = get_jwt_identity()
+    """Queue an export of reports in various formats"""
+    current_user_id = jwt_user_id()
     data = request.get_json()
     
     export_format = data.get('format', 'json')  # json, csv, txt
-    report_ids = data.get('report_ids', [])
-    include_data = data.get('include_data', True)
+    if export_format not in ('json', 'csv', 'txt'):
+        return jsonify({'error': 'Unsupported export format'}), 400
     
-    # Get reports
-    if report_ids:
-        reports = Report.query.filter(Report.id.in_(report_ids), Report.is_active == True).all()
-    else:
-        reports = Report.query.filter_by(is_active=True).all()
-    
-    # Filter reports user can access
-    user = User.query.get(current_user_id)
-    if not user.has_permission('admin'):
-        reports = [r for r in reports if r.created_by == current_user_id]
-    
-    if export_format == 'json':
-        export_data = []
-        for report in reports:
-            report_dict = report.to_dict()
-            if not include_data:
-                report_dict.pop('data', None)
-            export_data.append(report_dict)
-        
-        output = io.StringIO()
-        json.dump(export_data, output, ensure_ascii=False, indent=2)
-        output.seek(0)
-        
-        response = make_response(output.getvalue())
-        response.headers['Content-Type'] = 'application/json; charset=utf-8'
-        response.headers['Content-Disposition'] = f'attachment; filename=reports_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json'
-        return response
-    
-    elif export_format == 'csv':
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # Write header
-        headers = ['ID', 'Type', 'Title', 'Content', 'Creator', 'Created At', 'Updated At']
-        writer.writerow(headers)
-        
-        # Write data
-        for report in reports:
-            writer.writerow([
-                report.id,
-                report.type,
-                report.title,
-                report.content or '',
-                report.creator.username if report.creator else '',
-                report.created_at.isoformat() if report.created_at else '',
-                report.updated_at.isoformat() if report.updated_at else ''
-            ])
-        
-        output.seek(0)
-        response = make_response(output.getvalue())
-        response.headers['Content-Type'] = 'text/csv; charset=utf-8'
-        response.headers['Content-Disposition'] = f'attachment; filename=reports_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-        return response
-    
-    elif export_format == 'txt':
-        output = io.StringIO()
-        
-        for i, report in enumerate(reports):
-            if i > 0:
-                output.write('\n' + '='*50 + '\n\n')
-            
-            output.write(f"تقرير #{report.id}\n")
-            output.write(f"النوع: {report.type}\n")
-            output.write(f"العنوان: {report.title}\n")
-            output.write(f"المنشئ: {report.creator.username if report.creator else 'غير معروف'}\n")
-            output.write(f"تاريخ الإنشاء: {report.created_at.strftime('%Y-%m-%d %H:%M') if report.created_at else 'غير محدد'}\n")
-            output.write(f"\nالمحتوى:\n{report.content or 'لا يوجد محتوى'}\n")
-        
-        output.seek(0)
-        response = make_response(output.getvalue())
-        response.headers['Content-Type'] = 'text/plain; charset=utf-8'
-        response.headers['Content-Disposition'] = f'attachment; filename=reports_{datetime.now().strftime("%Y%m%d_%H%M%S")}.txt'
-        return response
+    job = enqueue('export_reports', {
+        'user_id': current_user_id,
+        'format': export_format,
+        'report_ids': data.get('report_ids', []),
+        'include_data': data.get('include_data', True)
+    }, created_by=current_user_id)
     
-    return jsonify({'error': 'Unsupported export format'}), 400
+    return job_accepted(job, 'Export queued')
 
 @sharing_bp.route('/api/participants/export', methods=['POST'])
 @jwt_required()
 @require_permission('leader')
 def export_participants():
-    """Export participants data"""
+    """Queue an export of participants data"""
+    current_user_id = jwt_user_id()
     data = request.get_json()
     export_format = data.get('format', 'csv')  # csv, json
-    include_medical = data.get('include_medical', False)
+    if export_format not in ('json', 'csv'):
+        return jsonify({'error': 'Unsupported export format'}), 400
     
-    participants = Participant.query.filter_by(status='active').all()
+    job = enqueue('export_participants', {
+        'format': export_format,
+        'include_medical': data.get('include_medical', False)
+    }, created_by=current_user_id)
     
-    if export_format == 'json':
-        export_data = []
-        for participant in participants:
-            participant_dict = participant.to_dict()
-            if not include_medical:
-                participant_dict.pop('medical_info', None)
-            export_data.append(participant_dict)
-        
-        output = io.StringIO()
-        json.dump(export_data, output, ensure_ascii=False, indent=2)
-        output.seek(0)
-        
-        response = make_response(output.getvalue())
-        response.headers['Content-Type'] = 'application/json; charset=utf-8'
-        response.headers['Content-Disposition'] = f'attachment; filename=participants_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json'
-        return response
-    
-    elif export_format == 'csv':
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # Write header
-        headers = ['ID', 'Name', 'Email', 'Phone', 'Age', 'Role', 'Join Date', 'Emergency Contact', 'Emergency Phone']
-        if include_medical:
-            headers.append('Medical Info')
-        writer.writerow(headers)
-        
-        # Write data
-        for participant in participants:
-            row = [
-                participant.id,
-                participant.name,
-                participant.email or '',
-                participant.phone or '',
-                participant.age or '',
-                participant.role or '',
-                participant.join_date.isoformat() if participant.join_date else '',
-                participant.emergency_contact or '',
-                participant.emergency_phone or ''
-            ]
-            if include_medical:
-                row.append(participant.medical_info or '')
-            writer.writerow(row)
-        
-        output.seek(0)
-        response = make_response(output.getvalue())
-        response.headers['Content-Type'] = 'text/csv; charset=utf-8'
-        response.headers['Content-Disposition'] = f'attachment; filename=participants_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-        return response
-    
-    return jsonify({'error': 'Unsupported export format'}), 400
+    return job_accepted(job, 'Export queued')
+
+@sharing_bp.route('/api/participants/import', methods=['POST'])
+@jwt_required()
+@require_permission('leader')
+def import_participants():
+    """Bulk import participants from an uploaded CSV/XLSX file"""
+    current_user_id = jwt_user_id()
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        return jsonify({'error': 'No file uploaded'}), 400
+    
+    dry_run = request.form.get('dry_run') in ('1', 'true')
+    try:
+        summary = run_participant_import(upload.stream, upload.filename, created_by=current_user_id, dry_run=dry_run)
+    except ImportFormatError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Import failed: {str(e)}'}), 500
+    
+    if summary.get('error'):
+        return jsonify(summary), 500  # partial import: earlier batches were committed
+    return jsonify(summary)
 
 # Print-friendly Routes
 @sharing_bp.route('/api/reports/<int:report_id>/print', methods=['GET'])
@@ -274,7 +200,7 @@ def export_participants():
 @require_permission('leader')
 def get_print_report(report_id):
     """Get report in print-friendly format"""
-    current_user_id = get_jwt_identity()
+    current_user_id = jwt_user_id()
     report = Report.query.get_or_404(report_id)
     
     # Check permissions
@@ -322,24 +248,36 @@ def get_print_report(report_id):
     response.headers['Content-Type'] = 'text/html; charset=utf-8'
     return response
 
-# Email Sharing (placeholder for future implementation)
+# Email Sharing
 @sharing_bp.route('/api/reports/<int:report_id>/email', methods=['POST'])
 @jwt_required()
 @require_permission('leader')
 def email_report(report_id):
-    """Send report via email (placeholder)"""
-    # This would integrate with an email service like SendGrid, AWS SES, etc.
+    """Queue sending a report via email"""
+    current_user_id = jwt_user_id()
+    report = Report.query.get_or_404(report_id)
+    
+    # Check permissions
+    user = User.query.get(current_user_id)
+    if not user.has_permission('admin') and report.created_by != current_user_id:
+        return jsonify({'error': 'You can only email your own reports'}), 403
+    
     data = request.get_json()
     recipients = data.get('recipients', [])
     subject = data.get('subject', 'تقرير من فريق الكشافة')
     message = data.get('message', '')
     
-    # For now, just return success message
-    return jsonify({
-        'message': 'Email functionality not implemented yet',
+    if not recipients:
+        return jsonify({'error': 'At least one recipient is required'}), 400
+    
+    job = enqueue('email_report', {
+        'report_id': report_id,
         'recipients': recipients,
-        'subject': subject
-    })
+        'subject': subject,
+        'message': message
+    }, created_by=current_user_id)
+    
+    return job_accepted(job, 'Email queued')
 
 # Share link management
 @sharing_bp.route('/api/share-links', methods=['GET'])
@@ -347,11 +285,11 @@ def email_report(report_id):
 @require_permission('leader')
 def get_share_links():
     """Get all share links created by current user"""
-    current_user_id = get_jwt_identity()
+    current_user_id = jwt_user_id()
     
     user_links = []
     for token, info in shared_links.items():
-        if info['created_by'] == current_user_id:
+        if info['created_by'] == current_user_id and info['tenant'] == current_tenant():
             user_links.append({
                 'token': token,
                 'type': info['type'],
@@ -368,13 +306,13 @@ def get_share_links():
 @require_permission('leader')
 def delete_share_link(share_token):
     """Delete a share link"""
-    current_user_id = get_jwt_identity()
+    current_user_id = jwt_user_id()
     
     if share_token not in shared_links:
         return jsonify({'error': 'Share link not found'}), 404
     
     share_info = shared_links[share_token]
-    if share_info['created_by'] != current_user_id:
+    if share_info['created_by'] != current_user_id or share_info['tenant'] != current_tenant():
         return jsonify({'error': 'Access denied'}), 403
     
     del shared_links[share_token]
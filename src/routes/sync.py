@@ -0,0 +1,39 @@
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required
+from datetime import datetime
+from src.models.user import User
+from src.serialization import dumps
+from src.sync import COLLECTIONS, DEFAULT_LIMIT, sync
+from src.sessions import jwt_user_id
+
+sync_bp = Blueprint('sync', __name__)
+
+@sync_bp.route('/api/sync', methods=['POST'])
+@jwt_required()
+def sync_collections():
+    """Return rows changed since each collection's cursor"""
+    user = User.query.get(jwt_user_id())
+    if not user or not user.is_active:
+        return jsonify({'error': 'User not found'}), 404
+
+    data = request.get_json() or {}
+    cursors = data.get('cursors')
+    if cursors is None:
+        cursors = {name: None for name in COLLECTIONS}
+    if not isinstance(cursors, dict):
+        return jsonify({'error': 'cursors must be an object of collection -> cursor'}), 400
+
+    try:
+        limit = int(data.get('limit') or DEFAULT_LIMIT)  # sync() clamps it to 1..MAX_LIMIT
+    except (TypeError, ValueError):
+        return jsonify({'error': 'limit must be an integer'}), 400
+
+    try:
+        collections = sync(user, cursors, limit=limit,
+                           settle_seconds=current_app.config.get('SYNC_SETTLE_SECONDS', 1),
+                           tombstone_days=current_app.config.get('RETENTION_TOMBSTONE_DAYS', 90))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    body = dumps({'collections': collections, 'server_time': datetime.utcnow()})
+    return current_app.response_class(body, mimetype='application/json')
@@ -0,0 +1,75 @@
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required
+from datetime import date, timedelta
+from sqlalchemy import func
+from src.models.user import User, Report
+from src.models.tenant import Tenant
+from src.models.settings import Participant, Activity
+from src.models.budget import BudgetRollup
+from src.tenancy import DEFAULT_TENANT, current_tenant, create_tenant, for_each_tenant, TenantError
+from src.sessions import jwt_user_id
+
+tenants_bp = Blueprint('tenants', __name__)
+
+def require_regional_admin(f):
+    """Admins of the default tenant act as the regional office"""
+    def wrapper(*args, **kwargs):
+        user = User.query.get(jwt_user_id())
+        if current_tenant() != DEFAULT_TENANT or not user or not user.has_permission('admin'):
+            return jsonify({'error': 'Insufficient permissions'}), 403
+        return f(*args, **kwargs)
+    wrapper.__name__ = f.__name__
+    return wrapper
+
+@tenants_bp.route('/api/tenants', methods=['GET'])
+@jwt_required()
+@require_regional_admin
+def get_tenants():
+    """List registered troops"""
+    tenants = Tenant.query.order_by(Tenant.slug).all()
+    return jsonify({'tenants': [tenant.to_dict() for tenant in tenants]})
+
+@tenants_bp.route('/api/tenants', methods=['POST'])
+@jwt_required()
+@require_regional_admin
+def add_tenant():
+    """Register a troop, create its database and its first admin"""
+    data = request.get_json() or {}
+    try:
+        tenant = create_tenant(data.get('slug'), data.get('name'), data.get('admin') or {})
+    except TenantError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'message': 'Tenant created successfully', 'tenant': tenant.to_dict()}), 201
+
+def troop_summary():
+    today = date.today()
+    budget, spent = (BudgetRollup.query
+                     .with_entities(func.coalesce(func.sum(BudgetRollup.budget), 0),
+                                    func.coalesce(func.sum(BudgetRollup.spent), 0))
+                     .filter(BudgetRollup.month >= f'{today.year}-01')
+                     .one())
+    return {
+        'users': User.query.filter_by(is_active=True).count(),
+        'participants': Participant.query.filter_by(status='active').count(),
+        'active_reports': Report.query.filter_by(is_active=True).count(),
+        'upcoming_activities': Activity.query.filter(Activity.date >= today,
+                                                     Activity.date <= today + timedelta(days=30),
+                                                     Activity.status != 'cancelled').count(),
+        'budget_this_year': budget,
+        'spent_this_year': spent
+    }
+
+@tenants_bp.route('/api/tenants/summary', methods=['GET'])
+@jwt_required()
+@require_regional_admin
+def get_regional_summary():
+    """Key numbers for every troop, gathered from each troop's database in parallel"""
+    app = current_app._get_current_object()
+    troops = for_each_tenant(app, troop_summary, max_workers=app.config.get('TENANT_SUMMARY_WORKERS', 4))
+
+    totals = {}
+    for summary in troops.values():
+        for key, value in summary.items():
+            if key != 'error':
+                totals[key] = totals.get(key, 0) + value
+    return jsonify({'troops': troops, 'totals': totals})
@@ -0,0 +1,252 @@
+"""Activity scheduling: an interval index for conflicts and calendars, and capacity counters.
+
+Every activity that is not cancelled occupies the interval
+[date + time, + duration_minutes); activities without a time take the whole
+day. The interval is written to activity_slots once per day it covers, so
+"what overlaps this slot at this location" and "what happens this month" are
+range scans on indexed (location_key, day) / (day) columns.
+
+Activity.attendee_count counts attendance records that hold a place (any
+status except absent). It is changed with a conditional UPDATE in the same
+flush as the attendance row, so two concurrent registrations can never both
+take the last place. A participant has at most one attendance record per
+activity (unique index), and counter updates leave Activity.updated_at alone
+so delta sync clients don't download the activity again for each attendance.
+
+    python -m src.scheduling rebuild    # recompute slots and counters
+"""
+import sys
+from datetime import datetime, timedelta, time as day_time
+from flask import current_app
+from sqlalchemy import event, func, or_, select, inspect as sa_inspect
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.schema import CreateColumn
+from src.database import db
+from src.models.settings import Activity, Attendance
+from src.models.schedule import ActivitySlot
+
+DEFAULT_DURATION_MINUTES = 120
+MAX_DURATION_DAYS = 31
+RELEASED_STATUSES = ('absent',)
+SCHEDULE_FIELDS = ('date', 'time', 'duration_minutes', 'location', 'status')
+
+# One attendance record per participant and activity; create_all() builds it
+# for new databases and ensure_indexes() adds it to existing ones
+ATTENDANCE_INDEX = db.Index('ux_attendance_activity_participant',
+                            Attendance.activity_id, Attendance.participant_id, unique=True)
+
+class CapacityError(ValueError):
+    """The activity has no free places left"""
+
+    def __init__(self, activity_id):
+        super().__init__(f'Activity {activity_id} is full')
+        self.activity_id = activity_id
+
+def normalize_location(location):
+    if not location:
+        return None
+    return ' '.join(location.split()).casefold() or None
+
+def activity_interval(activity_date, activity_time=None, duration_minutes=None):
+    """(starts_at, ends_at) of an activity"""
+    if activity_time is None:
+        starts_at = datetime.combine(activity_date, day_time.min)
+        minutes = duration_minutes or 24 * 60
+    else:
+        starts_at = datetime.combine(activity_date, activity_time)
+        minutes = duration_minutes or DEFAULT_DURATION_MINUTES
+    minutes = max(1, min(minutes, MAX_DURATION_DAYS * 24 * 60))
+    return starts_at, starts_at + timedelta(minutes=minutes)
+
+def covered_days(starts_at, ends_at):
+    day = starts_at.date()
+    last = (ends_at - timedelta(microseconds=1)).date()
+    while day <= last:
+        yield day
+        day += timedelta(days=1)
+
+def slot_rows(activity_id, activity_date, activity_time, duration_minutes, location, status):
+    if status == 'cancelled' or activity_date is None:
+        return []
+    starts_at, ends_at = activity_interval(activity_date, activity_time, duration_minutes)
+    location_key = normalize_location(location)
+    return [{'activity_id': activity_id, 'day': day, 'location_key': location_key,
+             'starts_at': starts_at, 'ends_at': ends_at}
+            for day in covered_days(starts_at, ends_at)]
+
+def index_activity(connection, activity):
+    slots = ActivitySlot.__table__
+    connection.execute(slots.delete().where(slots.c.activity_id == activity.id))
+    rows = slot_rows(activity.id, activity.date, activity.time, activity.duration_minutes,
+                     activity.location, activity.status)
+    if rows:
+        connection.execute(slots.insert(), rows)
+
+@event.listens_for(Activity, 'after_insert')
+def index_new_activity(mapper, connection, activity):
+    index_activity(connection, activity)
+
+@event.listens_for(Activity, 'after_update')
+def reindex_activity(mapper, connection, activity):
+    state = sa_inspect(activity)
+    if any(state.attrs[field].history.has_changes() for field in SCHEDULE_FIELDS):
+        index_activity(connection, activity)
+
+@event.listens_for(Activity, 'after_delete')
+def unindex_activity(mapper, connection, activity):
+    slots = ActivitySlot.__table__
+    connection.execute(slots.delete().where(slots.c.activity_id == activity.id))
+
+# Capacity counters
+
+def holds_place(status):
+    return status not in RELEASED_STATUSES  # None means the column default, present
+
+def reserve_place(connection, activity_id):
+    activities = Activity.__table__
+    result = connection.execute(
+        activities.update()
+        .where(activities.c.id == activity_id,
+               or_(activities.c.max_participants.is_(None),
+                   activities.c.attendee_count < activities.c.max_participants))
+        .values(attendee_count=activities.c.attendee_count + 1, updated_at=activities.c.updated_at)
+    )
+    if result.rowcount == 0:
+        raise CapacityError(activity_id)
+
+def release_place(connection, activity_id):
+    activities = Activity.__table__
+    connection.execute(
+        activities.update()
+        .where(activities.c.id == activity_id, activities.c.attendee_count > 0)
+        .values(attendee_count=activities.c.attendee_count - 1, updated_at=activities.c.updated_at)
+    )
+
+@event.listens_for(Attendance, 'before_insert')
+def reserve_attendance(mapper, connection, record):
+    if holds_place(record.status):
+        reserve_place(connection, record.activity_id)
+
+@event.listens_for(Attendance, 'before_update')
+def move_attendance(mapper, connection, record):
+    state = sa_inspect(record)
+    activity_history = state.attrs.activity_id.history
+    status_history = state.attrs.status.history
+    if not (activity_history.has_changes() or status_history.has_changes()):
+        return
+
+    old_activity = activity_history.deleted[0] if activity_history.deleted else record.activity_id
+    old_status = status_history.deleted[0] if status_history.deleted else record.status
+    old_place = (old_activity, holds_place(old_status))
+    new_place = (record.activity_id, holds_place(record.status))
+    if old_place == new_place:
+        return
+
+    # Take the new place first so a full activity leaves the record unchanged
+    if new_place[1]:
+        reserve_place(connection, record.activity_id)
+    if old_place[1]:
+        release_place(connection, old_activity)
+
+@event.listens_for(Attendance, 'after_delete')
+def release_attendance(mapper, connection, record):
+    if holds_place(record.status):
+        release_place(connection, record.activity_id)
+
+# Queries
+
+def find_conflicts(location, starts_at, ends_at, exclude_id=None):
+    """Activities at the same location whose interval overlaps [starts_at, ends_at)"""
+    location_key = normalize_location(location)
+    if location_key is None:
+        return []
+    days = list(covered_days(starts_at, ends_at))
+    query = (db.session.query(ActivitySlot.activity_id)
+             .filter(ActivitySlot.location_key == location_key,
+                     ActivitySlot.day >= days[0],
+                     ActivitySlot.day <= days[-1],
+                     ActivitySlot.starts_at < ends_at,
+                     ActivitySlot.ends_at > starts_at)
+             .distinct())
+    if exclude_id is not None:
+        query = query.filter(ActivitySlot.activity_id != exclude_id)
+    ids = [activity_id for (activity_id,) in query]
+    if not ids:
+        return []
+    return Activity.query.filter(Activity.id.in_(ids)).order_by(Activity.date, Activity.time, Activity.id).all()
+
+def calendar(date_from, date_to, location=None):
+    """Activities occurring between two dates (inclusive) and the days each one covers"""
+    query = (db.session.query(ActivitySlot.day, ActivitySlot.activity_id)
+             .filter(ActivitySlot.day >= date_from, ActivitySlot.day <= date_to))
+    if location:
+        query = query.filter(ActivitySlot.location_key == normalize_location(location))
+
+    days = {}
+    for day, activity_id in query.order_by(ActivitySlot.day, ActivitySlot.starts_at, ActivitySlot.activity_id):
+        days.setdefault(day.isoformat(), []).append(activity_id)
+
+    ids = {activity_id for activity_ids in days.values() for activity_id in activity_ids}
+    activities = []
+    if ids:
+        activities = (Activity.query.filter(Activity.id.in_(ids))
+                      .order_by(Activity.date, Activity.time, Activity.id).all())
+    return activities, days
+
+def rebuild(batch_size=1000):
+    """Recompute every activity's slots and attendee_count; returns the number of slots"""
+    activities = Activity.__table__
+    attendance = Attendance.__table__
+    taken = (select(func.count())
+             .where(attendance.c.activity_id == activities.c.id,
+                    or_(attendance.c.status.is_(None), attendance.c.status.notin_(RELEASED_STATUSES)))
+             .scalar_subquery())
+    # Keep updated_at so the recount does not show up as a change in delta sync
+    db.session.execute(activities.update().values(attendee_count=taken, updated_at=activities.c.updated_at))
+    db.session.execute(ActivitySlot.__table__.delete())
+
+    count = 0
+    batch = []
+    rows = db.session.query(Activity.id, Activity.date, Activity.time, Activity.duration_minutes,
+                            Activity.location, Activity.status).all()
+    for row in rows:
+        batch.extend(slot_rows(*row))
+        if len(batch) >= batch_size:
+            db.session.execute(ActivitySlot.__table__.insert(), batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        db.session.execute(ActivitySlot.__table__.insert(), batch)
+        count += len(batch)
+    db.session.commit()
+    return count
+
+def ensure_columns():
+    """Add the scheduling columns to an activities table created before they existed"""
+    existing = {column['name'] for column in sa_inspect(db.engine).get_columns('activities')}
+    added = []
+    with db.engine.begin() as connection:
+        for column in (Activity.__table__.c.duration_minutes, Activity.__table__.c.attendee_count):
+            if column.name not in existing:
+                ddl = CreateColumn(column).compile(dialect=connection.dialect)
+                connection.exec_driver_sql(f'ALTER TABLE activities ADD COLUMN {ddl}')
+                added.append(column.name)
+    return added
+
+def ensure_indexes():
+    """Add the attendance unique index to an existing database, unless it already holds duplicates"""
+    try:
+        ATTENDANCE_INDEX.create(db.engine, checkfirst=True)
+    except IntegrityError:
+        current_app.logger.warning('Duplicate attendance records found; remove them so %s can be created',
+                                   ATTENDANCE_INDEX.name)
+
+if __name__ == '__main__':
+    if sys.argv[1:] != ['rebuild']:
+        sys.exit('usage: python -m src.scheduling rebuild')
+    from src.main import app
+    from src.tenancy import tenant_slugs, tenant_context
+    with app.app_context():
+        for tenant in tenant_slugs():
+            with tenant_context(tenant):
+                print(f'{tenant}: rebuilt {rebuild()} activity slots')
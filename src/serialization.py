@@ -0,0 +1,181 @@
+"""Fast JSON serialization for models and API responses.
+
+Serializers are generated once per model (and field selection) from the
+model's columns and cached, so serializing a row is a single function call
+building one dict. Field selections are reduced to known fields in
+declaration order and the cache keeps the MAX_SERIALIZERS most recently used,
+so ?fields= from clients cannot grow it without bound. Encoding uses orjson when it is installed, which handles
+datetimes natively and writes UTF-8 Arabic text without \\u escapes; the
+stdlib json module is used otherwise.
+"""
+import json
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, time
+from flask import request, current_app
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import inspect as sa_inspect
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+# orjson serializes date/time types itself; the stdlib needs isoformat()
+NATIVE_DATETIME = orjson is not None
+
+# Per-model configuration: columns never serialized and computed extra fields
+_excluded = {}
+_extras = {}
+_serializers = OrderedDict()
+MAX_SERIALIZERS = 256
+_serializers_lock = threading.Lock()
+
+def dumps(obj):
+    """Encode obj as compact UTF-8 JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=DefaultJSONProvider.default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_stdlib_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def _stdlib_default(obj):
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+    return DefaultJSONProvider.default(obj)
+
+def register(model, exclude=(), extras=None):
+    """Configure how a model is serialized; extras map field name -> function(obj)"""
+    _excluded[model] = tuple(exclude)
+    _extras[model] = dict(extras or {})
+    with _serializers_lock:
+        for key in [key for key in _serializers if key[0] is model]:
+            del _serializers[key]
+
+def default_fields(model):
+    """Columns (in declaration order) followed by registered extras"""
+    excluded = _excluded.get(model, ())
+    columns = [attr.key for attr in sa_inspect(model).column_attrs if attr.key not in excluded]
+    return columns + list(_extras.get(model, {}))
+
+def _compile(model, fields):
+    column_types = {attr.key: attr.columns[0].type for attr in sa_inspect(model).column_attrs}
+    extras = _extras.get(model, {})
+    namespace = {}
+    items = []
+
+    for i, name in enumerate(fields):
+        if name in extras:
+            namespace[f'_extra{i}'] = extras[name]
+            expression = f'_extra{i}(obj)'
+        elif name in column_types:
+            if not NATIVE_DATETIME and _python_type(column_types[name]) in (datetime, date, time):
+                expression = f'(obj.{name}.isoformat() if obj.{name} is not None else None)'
+            else:
+                expression = f'obj.{name}'
+        else:
+            continue
+        items.append(f'{name!r}: {expression}')
+
+    source = 'def serialize(obj):\n    return {' + ', '.join(items) + '}\n'
+    exec(compile(source, f'<serializer {model.__name__}>', 'exec'), namespace)
+    return namespace['serialize']
+
+def _python_type(column_type):
+    try:
+        return column_type.python_type
+    except NotImplementedError:
+        return None
+
+def serializer_for(model, fields=None, exclude=None):
+    """Return the cached serializer for a model and field selection"""
+    selected = default_fields(model)  # never lets field selection expose excluded columns
+    if fields:
+        # Unknown names, duplicates and ordering don't make a new serializer
+        wanted = set(fields)
+        selected = [f for f in selected if f in wanted]
+    if exclude:
+        selected = [f for f in selected if f not in exclude]
+
+    key = (model, tuple(selected))
+    with _serializers_lock:
+        serializer = _serializers.get(key)
+        if serializer is None:
+            serializer = _serializers[key] = _compile(model, selected)
+            if len(_serializers) > MAX_SERIALIZERS:
+                _serializers.popitem(last=False)
+        else:
+            _serializers.move_to_end(key)
+    return serializer
+
+def serialize(objects, fields=None, exclude=None):
+    """Serialize a model instance or a list of instances of the same model"""
+    if isinstance(objects, (list, tuple)):
+        if not objects:
+            return []
+        serializer = serializer_for(type(objects[0]), fields, exclude)
+        return [serializer(obj) for obj in objects]
+    return serializer_for(type(objects), fields, exclude)(objects)
+
+def requested_fields():
+    """Field selection from the ?fields=a,b,c query parameter, or None"""
+    fields = request.args.get('fields')
+    if not fields:
+        return None
+    return [f.strip() for f in fields.split(',') if f.strip()]
+
+def json_response(data, status=200):
+    """Build a JSON response without going through jsonify"""
+    return current_app.response_class(dumps(data), status=status, mimetype='application/json')
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that encodes with orjson and never indents"""
+
+    ensure_ascii = False
+
+    def dumps(self, obj, **kwargs):
+        if orjson is not None and not kwargs.get('sort_keys'):
+            return dumps(obj).decode('utf-8')
+        kwargs.setdefault('ensure_ascii', False)
+        kwargs.setdefault('default', _stdlib_default)
+        return json.dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj), mimetype=self.mimetype)
+
+def _register_models():
+    from src.models.user import User, Report
+    from src.models.activation import ActivationCode, UserActivation, Comment
+    from src.models.job import Job
+
+    register(User, exclude=('password_hash',))
+    register(Report, extras={
+        'creator_name': lambda r: r.creator.username if r.creator else None
+    })
+    register(ActivationCode, extras={
+        'remaining_uses': lambda c: c.max_uses - c.current_uses
+    })
+    register(UserActivation, extras={
+        'user_name': lambda a: a.user.username if a.user else None,
+        'activation_code': lambda a: a.activation_code.code if a.activation_code else None
+    })
+    register(Comment, extras={
+        'user_name': lambda c: c.user.username if c.user else None,
+        'user_full_name': lambda c: c.user.full_name if c.user else None,
+        'replies': lambda c: [dict(serializer_for(Comment, exclude=('replies',))(reply), replies=[])
+                              for reply in c.replies]
+    })
+    register(Job, exclude=('payload', 'locked_by', 'artifact_path', 'artifact_type', 'updated_at'), extras={
+        'has_artifact': lambda j: bool(j.artifact_path)
+    })
+
+_register_models()
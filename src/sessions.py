@@ -0,0 +1,243 @@
+"""Login sessions, refresh-token rotation and the token blocklist.
+
+Access tokens are short-lived; each login creates an AuthSession whose
+refresh token is rotated on every use (reusing an old one revokes the whole
+session). Revocations are appended to the revocations table and replayed by
+every worker into an in-memory Blocklist; the worker that records one applies
+it as soon as its transaction commits:
+
+- revoked token ids go into a bloom filter backed by an exact set, so the
+  common "not revoked" answer costs one hash and never touches the database
+- revoked sessions are a set of session ids
+- deactivated users get a cutoff: tokens issued before it are rejected
+- tokens without an exp or sid claim (issued before sessions existed, and
+  never expiring) are always rejected
+
+A background thread in each worker polls every tenant's revocations table
+for new rows every BLOCKLIST_SYNC_SECONDS. Tokens carry a tenant claim and
+user cutoffs are kept per tenant, since user ids repeat across troops.
+"""
+import os
+import time
+import hashlib
+import calendar
+import threading
+from datetime import datetime, timedelta
+from flask import request, current_app
+from flask_jwt_extended import create_access_token, create_refresh_token, get_jti, get_jwt_identity
+from sqlalchemy import event, inspect as sa_inspect
+from sqlalchemy.orm import Session
+from src.database import db
+from src.models.user import User
+from src.models.session import AuthSession, Revocation
+from src.tenancy import DEFAULT_TENANT, current_tenant, tenant_slugs, tenant_context
+
+class BloomFilter:
+    def __init__(self, bits=1 << 20, hashes=7):
+        self.bits = bits
+        self.hashes = hashes
+        self.array = bytearray(bits // 8)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.array[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        return all(self.array[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+def _timestamp(value):
+    return calendar.timegm(value.utctimetuple())
+
+class Blocklist:
+    def __init__(self, sync_seconds=2, reload_seconds=3600):
+        self.sync_seconds = sync_seconds
+        self.reload_seconds = reload_seconds
+        self.lock = threading.Lock()
+        self.start_lock = threading.Lock()
+        self.pid = None
+        self._reset()
+
+    def _reset(self):
+        self.bloom = BloomFilter()
+        self.jtis = set()
+        self.sessions = set()
+        self.user_cutoffs = {}
+        self.last_ids = {}
+        self.loaded_at = time.monotonic()
+
+    def apply(self, kind, key, revoked_at, tenant=DEFAULT_TENANT):
+        with self.lock:
+            if kind == 'jti':
+                self.bloom.add(key)
+                self.jtis.add(key)
+            elif kind == 'session':
+                self.sessions.add(key)
+            elif kind == 'user':
+                cutoff = _timestamp(revoked_at)
+                key = (tenant, key)
+                if cutoff > self.user_cutoffs.get(key, 0):
+                    self.user_cutoffs[key] = cutoff
+
+    def is_revoked(self, payload):
+        if not payload.get('exp') or not payload.get('sid'):
+            return True  # legacy non-expiring token that no session can revoke
+        jti = payload.get('jti')
+        if jti and jti in self.bloom and jti in self.jtis:
+            return True
+        sid = payload.get('sid')
+        if sid and sid in self.sessions:
+            return True
+        cutoff = self.user_cutoffs.get((payload.get('tenant', DEFAULT_TENANT), str(payload.get('sub'))))
+        return bool(cutoff and payload.get('iat', 0) <= cutoff)
+
+    def sync(self):
+        """Replay revocations added since the last sync; rebuild from scratch periodically"""
+        reload = time.monotonic() - self.loaded_at > self.reload_seconds
+        if reload:
+            with self.lock:
+                self._reset()
+        for tenant in tenant_slugs():
+            with tenant_context(tenant):
+                self._sync_tenant(tenant, purge=reload)
+
+    def _sync_tenant(self, tenant, purge=False):
+        now = datetime.utcnow()
+        if purge:
+            Revocation.query.filter(Revocation.expires_at < now).delete()
+            db.session.commit()
+
+        last_id = self.last_ids.get(tenant, 0)
+        rows = (Revocation.query
+                .filter(Revocation.id > last_id)
+                .order_by(Revocation.id)
+                .with_entities(Revocation.id, Revocation.kind, Revocation.key, Revocation.revoked_at, Revocation.expires_at)
+                .all())
+        for row_id, kind, key, revoked_at, expires_at in rows:
+            if expires_at is None or expires_at > now:
+                self.apply(kind, key, revoked_at, tenant)
+            last_id = max(last_id, row_id)
+        self.last_ids[tenant] = last_id
+
+    def start(self, app):
+        """Load the blocklist and keep it in sync; safe to call after a fork"""
+        if self.pid == os.getpid():
+            return
+        with self.start_lock:
+            if self.pid == os.getpid():
+                return
+            self.sync_seconds = app.config.get('BLOCKLIST_SYNC_SECONDS', self.sync_seconds)
+            with self.lock:
+                self._reset()
+            with app.app_context():
+                self.sync()
+                db.session.remove()
+            self.pid = os.getpid()  # only once loaded, so concurrent first requests wait for it
+
+        def run():
+            while True:
+                time.sleep(self.sync_seconds)
+                try:
+                    with app.app_context():
+                        self.sync()
+                        db.session.remove()
+                except Exception:
+                    app.logger.exception('Token blocklist sync failed')
+
+        threading.Thread(target=run, name='blocklist-sync', daemon=True).start()
+
+blocklist = Blocklist()
+
+def jwt_user_id():
+    """Id of the user the verified token was issued to (tokens carry it as a string)"""
+    identity = get_jwt_identity()
+    return int(identity) if identity is not None else None
+
+def refresh_expires(app):
+    return app.config.get('JWT_REFRESH_TOKEN_EXPIRES') or timedelta(days=30)
+
+def record_revocation(kind, key, expires_at=None, connection=None):
+    """Persist a revocation for all workers; this one applies it once db.session commits"""
+    revoked_at = datetime.utcnow()
+    values = {'kind': kind, 'key': str(key), 'revoked_at': revoked_at, 'expires_at': expires_at}
+    if connection is not None:
+        connection.execute(Revocation.__table__.insert().values(**values))
+    else:
+        db.session.add(Revocation(**values))
+    db.session.info.setdefault('revocations', []).append((kind, str(key), revoked_at, current_tenant()))
+
+@event.listens_for(Session, 'after_commit')
+def apply_revocations(session):
+    for revocation in session.info.pop('revocations', ()):
+        blocklist.apply(*revocation)
+
+@event.listens_for(Session, 'after_rollback')
+def discard_revocations(session):
+    session.info.pop('revocations', None)
+
+def issue_tokens(user, session):
+    """New access/refresh pair bound to a session; only this refresh token stays valid"""
+    claims = {'sid': session.id, 'tenant': current_tenant()}
+    access_token = create_access_token(identity=user, additional_claims=claims)
+    refresh_token = create_refresh_token(identity=user, additional_claims=claims)
+    session.refresh_jti = get_jti(refresh_token)
+    session.last_used_at = datetime.utcnow()
+    return access_token, refresh_token
+
+def start_session(app, user):
+    session = AuthSession(
+        user_id=user.id,
+        user_agent=(request.headers.get('User-Agent') or '')[:255],
+        ip_address=request.remote_addr,
+        expires_at=datetime.utcnow() + refresh_expires(app)
+    )
+    db.session.add(session)
+    db.session.flush()
+    access_token, refresh_token = issue_tokens(user, session)
+    db.session.commit()
+    return access_token, refresh_token
+
+def rotate_session(app, payload):
+    """Exchange a refresh token for a new pair; returns (tokens, error message)"""
+    session = AuthSession.query.get(payload.get('sid'))
+    if not session or session.revoked_at is not None:
+        return None, 'الجلسة غير صالحة'
+
+    if session.refresh_jti != payload['jti']:
+        # An already-rotated refresh token was replayed: assume it leaked
+        revoke_session(session)
+        db.session.commit()
+        return None, 'تم إنهاء الجلسة لأسباب أمنية'
+
+    user = User.query.get(session.user_id)
+    if not user or not user.is_active:
+        return None, 'الحساب غير مفعل'
+
+    session.expires_at = datetime.utcnow() + refresh_expires(app)
+    tokens = issue_tokens(user, session)
+    db.session.commit()
+    return tokens, None
+
+def revoke_session(session):
+    session.revoked_at = datetime.utcnow()
+    session.refresh_jti = None
+    record_revocation('session', session.id, expires_at=session.expires_at)
+
+def revoke_token(payload):
+    expires_at = datetime.utcfromtimestamp(payload['exp']) if payload.get('exp') else None
+    record_revocation('jti', payload['jti'], expires_at=expires_at)
+
+@event.listens_for(User, 'after_update')
+def revoke_deactivated_user(mapper, connection, user):
+    """Deactivating a user cuts off every token issued to them so far"""
+    history = sa_inspect(user).attrs.is_active.history
+    if history.has_changes() and user.is_active is False:
+        connection.execute(AuthSession.__table__.update()
+                           .where(AuthSession.user_id == user.id, AuthSession.revoked_at.is_(None))
+                           .values(revoked_at=datetime.utcnow(), refresh_jti=None))
+        record_revocation('user', user.id, expires_at=datetime.utcnow() + refresh_expires(current_app), connection=connection)
@@ -0,0 +1,181 @@
+"""Delta sync for offline-capable clients.
+
+Each collection is synced with its own cursor, "<timestamp>|<id>", the
+position of the last row the client has seen in (timestamp, id) order.
+A sync returns rows changed after the cursor, ids of rows soft-deleted
+(is_active=False) or hard-deleted since then, and the next cursor. Rows
+newer than SYNC_SETTLE_SECONDS are left for the next sync so transactions
+still committing with an earlier timestamp are never skipped.
+
+Fields in a collection's restricted map (participants' medical_info) are
+only sent to users with the role it names.
+
+Every page carries the tombstones from the same timestamp window as its
+rows, so a sync split across pages reports each hard delete exactly once.
+Tombstones are purged by retention after RETENTION_TOMBSTONE_DAYS; a client
+whose cursor is older than that gets a full resync with "reset": true and
+must drop its local copy first.
+"""
+from datetime import datetime, timedelta
+from sqlalchemy import event, or_, and_, inspect as sa_inspect
+from sqlalchemy.schema import CreateColumn
+from src.database import db
+from src.models.user import Report
+from src.models.activation import Notification
+from src.models.settings import Participant, Activity
+from src.models.sync import SyncTombstone
+from src.serialization import serialize
+
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 2000
+
+class SyncCollection:
+    def __init__(self, name, model, timestamp='updated_at', owner=None, required_role='member', soft_delete=None,
+                 restricted=None):
+        self.name = name
+        self.model = model
+        self.timestamp = getattr(model, timestamp)
+        self.owner = getattr(model, owner) if owner else None
+        self.required_role = required_role
+        self.soft_delete = soft_delete  # column that is False for soft-deleted rows
+        self.restricted = restricted or {}  # field -> role needed to receive it
+
+    def excluded_fields(self, user):
+        return tuple(field for field, role in self.restricted.items() if not user.has_permission(role))
+
+    def base_query(self, user):
+        query = self.model.query
+        if self.owner is not None:
+            query = query.filter(self.owner == user.id)
+        return query
+
+    def is_deleted(self, row):
+        return self.soft_delete is not None and not getattr(row, self.soft_delete)
+
+    def changes(self, user, cursor, limit, upper, horizon=None):
+        since, last_id = parse_cursor(cursor)
+        reset = since is not None and horizon is not None and since < horizon
+        if reset:
+            since, last_id = None, None  # tombstones from then may be gone
+        timestamp = self.timestamp
+        query = self.base_query(user).filter(timestamp <= upper)
+
+        if since is None:
+            # First sync: the client holds nothing, so deleted rows are irrelevant
+            if self.soft_delete is not None:
+                query = query.filter(getattr(self.model, self.soft_delete) == True)
+        else:
+            query = query.filter(or_(timestamp > since, and_(timestamp == since, self.model.id > last_id)))
+
+        rows = query.order_by(timestamp, self.model.id).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        changed = [row for row in rows if not self.is_deleted(row)]
+        deleted = [row.id for row in rows if self.is_deleted(row)]
+
+        if has_more:
+            last = rows[-1]
+            page_upper = getattr(last, timestamp.key)
+            next_cursor = format_cursor(page_upper, last.id)
+        else:
+            # Everything up to the settle bound has been delivered
+            page_upper = upper
+            next_cursor = format_cursor(upper, 0)
+        if since is not None:
+            # Hard deletes in the same window as this page's rows; the next page starts after page_upper
+            deleted.extend(self.tombstones(user, since, page_upper))
+
+        result = {
+            'changed': serialize(changed, exclude=self.excluded_fields(user)),
+            'deleted': deleted,
+            'cursor': next_cursor,
+            'has_more': has_more
+        }
+        if reset:
+            result['reset'] = True
+        return result
+
+    def tombstones(self, user, since, upper):
+        query = (SyncTombstone.query
+                 .filter(SyncTombstone.collection == self.name,
+                         SyncTombstone.deleted_at > since,
+                         SyncTombstone.deleted_at <= upper))
+        if self.owner is not None:
+            query = query.filter(SyncTombstone.owner_id == user.id)
+        return [object_id for (object_id,) in query.with_entities(SyncTombstone.object_id)]
+
+COLLECTIONS = {
+    'reports': SyncCollection('reports', Report, soft_delete='is_active'),
+    'participants': SyncCollection('participants', Participant, required_role='leader',
+                                   restricted={'medical_info': 'admin'}),
+    'activities': SyncCollection('activities', Activity),
+    'notifications': SyncCollection('notifications', Notification, owner='user_id')
+}
+
+def parse_cursor(cursor):
+    """Split a cursor into (timestamp, id); (None, None) for a first sync"""
+    if not cursor:
+        return None, None
+    try:
+        timestamp, _, last_id = cursor.partition('|')
+        return datetime.fromisoformat(timestamp), int(last_id or 0)
+    except (AttributeError, ValueError):
+        raise ValueError(f'Invalid sync cursor {cursor!r}')
+
+def format_cursor(timestamp, last_id):
+    return f'{timestamp.isoformat()}|{last_id}'
+
+def sync(user, cursors, limit=DEFAULT_LIMIT, settle_seconds=1, tombstone_days=None):
+    """Changes for every requested collection the user may read"""
+    now = datetime.utcnow()
+    upper = now - timedelta(seconds=settle_seconds)
+    horizon = now - timedelta(days=tombstone_days) if tombstone_days else None
+    limit = max(1, min(limit, MAX_LIMIT))
+    result = {}
+    for name, cursor in cursors.items():
+        collection = COLLECTIONS.get(name)
+        if collection is None:
+            result[name] = {'error': 'Unknown collection'}
+        elif not user.has_permission(collection.required_role):
+            result[name] = {'error': 'Insufficient permissions'}
+        else:
+            result[name] = collection.changes(user, cursor, limit, upper, horizon)
+    return result
+
+def _record_tombstone(collection):
+    def listener(mapper, connection, target):
+        connection.execute(SyncTombstone.__table__.insert().values(
+            collection=collection.name,
+            object_id=target.id,
+            owner_id=getattr(target, collection.owner.key) if collection.owner is not None else None,
+            deleted_at=datetime.utcnow()
+        ))
+    return listener
+
+for _collection in COLLECTIONS.values():
+    event.listen(_collection.model, 'after_delete', _record_tombstone(_collection))
+
+# (timestamp, id) indexes sync reads by; create_all() builds them for new
+# databases and ensure_indexes() adds them to existing ones
+SYNC_INDEXES = [
+    db.Index('ix_report_updated_at_id', Report.updated_at, Report.id),
+    db.Index('ix_participants_updated_at_id', Participant.updated_at, Participant.id),
+    db.Index('ix_activities_updated_at_id', Activity.updated_at, Activity.id),
+    db.Index('ix_notifications_user_updated_at_id', Notification.user_id, Notification.updated_at, Notification.id)
+]
+
+def ensure_columns():
+    """Add notifications.updated_at to databases created before it, starting from created_at"""
+    column = Notification.__table__.c.updated_at
+    if column.name in {c['name'] for c in sa_inspect(db.engine).get_columns('notifications')}:
+        return False
+    with db.engine.begin() as connection:
+        ddl = CreateColumn(column).compile(dialect=connection.dialect)
+        connection.exec_driver_sql(f'ALTER TABLE notifications ADD COLUMN {ddl}')
+        connection.exec_driver_sql('UPDATE notifications SET updated_at = created_at')
+    return True
+
+def ensure_indexes():
+    for index in SYNC_INDEXES:
+        index.create(db.engine, checkfirst=True)
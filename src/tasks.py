@@ -0,0 +1,67 @@
+"""Background job handlers. Each handler receives the app and the claimed job."""
+from src.jobs import job_handler, set_progress, save_artifact
+from src.exports import (EXPORT_CONTENT_TYPES, export_filename, query_reports_for_export,
+                         query_participants_for_export, render_reports, render_participants)
+from src.mail import send_mail
+from src.database import read_replica
+from src.models.user import Report
+from src import audit, budget, retention
+
+@job_handler('export_reports')
+def export_reports_job(app, job):
+    payload = job.payload or {}
+    export_format = payload.get('format', 'json')
+    with read_replica():
+        reports = query_reports_for_export(payload.get('user_id'), payload.get('report_ids'))
+
+    content = render_reports(reports, export_format, payload.get('include_data', True),
+                             progress=lambda done, total: set_progress(job, done * 90 // total if total else 90))
+    if content is None:
+        raise ValueError(f'Unsupported export format {export_format!r}')
+
+    save_artifact(app, job, content, export_filename('reports', export_format), EXPORT_CONTENT_TYPES[export_format])
+    audit.record('export', 'reports', job.id, {'format': export_format, 'count': len(reports)}, user_id=job.created_by)
+    return {'count': len(reports)}
+
+@job_handler('export_participants')
+def export_participants_job(app, job):
+    payload = job.payload or {}
+    export_format = payload.get('format', 'csv')
+    with read_replica():
+        participants = query_participants_for_export()
+
+    content = render_participants(participants, export_format, payload.get('include_medical', False),
+                                  progress=lambda done, total: set_progress(job, done * 90 // total if total else 90))
+    if content is None:
+        raise ValueError(f'Unsupported export format {export_format!r}')
+
+    save_artifact(app, job, content, export_filename('participants', export_format), EXPORT_CONTENT_TYPES[export_format])
+    audit.record('export', 'participants', job.id, {'format': export_format, 'count': len(participants),
+                 'include_medical': bool(payload.get('include_medical', False))}, user_id=job.created_by)
+    return {'count': len(participants)}
+
+@job_handler('email_report')
+def email_report_job(app, job):
+    payload = job.payload or {}
+    report = Report.query.get(payload.get('report_id'))
+    if not report:
+        raise LookupError('Report not found')
+
+    body = payload.get('message') or ''
+    text = render_reports([report], 'txt')
+    if body:
+        body += '\n\n'
+    body += text
+
+    set_progress(job, 50)
+    send_mail(app, payload.get('recipients', []), payload.get('subject', 'تقرير من فريق الكشافة'), body)
+    return {'recipients': len(payload.get('recipients', []))}
+
+@job_handler('rebuild_budget_rollups')
+def rebuild_budget_rollups_job(app, job):
+    return {'lines': budget.rebuild()}
+
+@job_handler('apply_retention')
+def apply_retention_job(app, job):
+    results = retention.run(app.config, progress=lambda done, total: set_progress(job, done, total))
+    return {'policies': results}
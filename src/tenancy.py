@@ -0,0 +1,303 @@
+"""Multi-troop tenancy: one database per troop.
+
+The tenant of a request is taken from the subdomain under TENANT_BASE_DOMAIN
+(troop12.example.sa), else the tenant claim of the bearer token, else an
+X-Tenant header (for logging in on a shared domain), else the default
+tenant. The default tenant is the app's own SQLALCHEMY_DATABASE_URI, so a
+single-troop install behaves exactly as before.
+
+Every other tenant has its own SQLite file (TENANT_DATABASE_DIR/<slug>.db
+unless the registry row names another URI) and its own archive file. db.engines
+is routed to the current tenant's pooled engines, so db.session, Model.query
+and db.engine all follow the tenant without changes to the code using them.
+Read replicas (DATABASE_REPLICA_URLS) only serve the default tenant.
+Tenants are listed in the registry bind (SQLALCHEMY_BINDS['registry']).
+
+Background code switches tenants with tenant_context(slug); for_each_tenant()
+runs a function against every troop for the regional office.
+
+Each tenant's schema is checked against its stamp (ensure_schema) the first
+time a process builds that tenant's engines, so troops created before a
+schema change are upgraded on first use.
+"""
+import os
+import re
+import hashlib
+import time
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+import jwt as pyjwt
+from flask import g, request, jsonify, current_app, has_app_context
+from sqlalchemy import create_engine, select
+from src.database import db, engine_options, is_replica
+from src.models.tenant import Tenant
+from src.models.schema import SchemaStamp
+
+DEFAULT_TENANT = 'default'
+ROUTED_BINDS = (None, 'archive')
+SLUG_PATTERN = re.compile(r'^[a-z0-9][a-z0-9-]{1,62}$')
+REGISTRY_TTL_SECONDS = 30
+
+class TenantError(ValueError):
+    """Invalid or duplicate tenant"""
+
+class TenantRouter:
+    """Registry cache and one pooled engine per tenant and routed bind"""
+
+    def __init__(self):
+        self.lock = threading.RLock()  # the schema check re-enters engines_for through db.engine
+        self.engines = {}
+        self.pending = {}  # engines whose schema is being checked, only seen by the checking thread
+        self.tenants = {}
+        self.loaded_at = 0
+
+    def registry_engine(self, default_engines):
+        return default_engines.get('registry', default_engines[None])
+
+    def load(self, default_engines, force=False):
+        if not force and time.monotonic() - self.loaded_at < REGISTRY_TTL_SECONDS:
+            return self.tenants
+        table = Tenant.__table__
+        with self.registry_engine(default_engines).connect() as connection:
+            rows = connection.execute(select(table).where(table.c.is_active == True)).mappings().all()
+        self.tenants = {row['slug']: dict(row) for row in rows}
+        self.loaded_at = time.monotonic()
+        return self.tenants
+
+    def lookup(self, slug, default_engines):
+        return self.load(default_engines).get(slug)
+
+    def uris(self, app, slug, tenant):
+        directory = app.config.get('TENANT_DATABASE_DIR') or os.path.join(os.path.dirname(__file__), 'database', 'tenants')
+        os.makedirs(directory, exist_ok=True)
+        return {
+            None: tenant.get('database_uri') or f"sqlite:///{os.path.join(directory, f'{slug}.db')}",
+            'archive': tenant.get('archive_uri') or f"sqlite:///{os.path.join(directory, f'{slug}.archive.db')}"
+        }
+
+    def engines_for(self, app, slug, default_engines):
+        engines = self.engines.get(slug)
+        if engines is not None:
+            return engines
+
+        with self.lock:
+            engines = self.engines.get(slug) or self.pending.get(slug)
+            if engines is None:
+                tenant = self.lookup(slug, default_engines) or self.load(default_engines, force=True).get(slug)
+                if tenant is None:
+                    raise LookupError(f'Unknown tenant {slug!r}')
+                engines = dict(default_engines)  # other binds (the registry) stay shared
+                for bind_key, uri in self.uris(app, slug, tenant).items():
+                    options = engine_options(uri, app.config)
+                    if 'poolclass' not in options:
+                        options['pool_size'] = app.config.get('TENANT_POOL_SIZE', 5)
+                    engines[bind_key] = create_engine(uri, **options)
+                for bind_key in filter(is_replica, default_engines):
+                    engines[bind_key] = engines[None]  # tenants have no replicas of their own
+                self.pending[slug] = engines
+                try:
+                    self.check_schema(app, slug)
+                finally:
+                    del self.pending[slug]
+                self.engines[slug] = engines
+        return engines
+
+    def check_schema(self, app, slug):
+        """Upgrade a tenant's schema if its stamp is out of date, in a context of its own"""
+        with app.app_context():  # own db.session, so the caller's transaction is untouched
+            g.tenant = slug
+            try:
+                ensure_schema(force=app.config.get('SCHEMA_CHECK') == 'always')
+            finally:
+                db.session.remove()
+
+    def dispose(self):
+        with self.lock:
+            for engines in self.engines.values():
+                for bind_key in ROUTED_BINDS:
+                    engines[bind_key].dispose()
+            self.engines.clear()
+            self.loaded_at = 0
+
+router = TenantRouter()
+
+def current_tenant():
+    if has_app_context():
+        return g.get('tenant', DEFAULT_TENANT)
+    return DEFAULT_TENANT
+
+def _default_engines():
+    return super(type(db), db).engines
+
+def route_engines(default_engines):
+    slug = current_tenant()
+    if slug == DEFAULT_TENANT:
+        return default_engines
+    return router.engines_for(current_app, slug, default_engines)
+
+db.engine_router = route_engines
+
+def dispose_engines():
+    """Close every pooled connection, e.g. before forking worker processes"""
+    for engine in _default_engines().values():
+        engine.dispose()
+    router.dispose()
+
+def tenant_slugs():
+    """The default tenant followed by every active registered tenant"""
+    return [DEFAULT_TENANT] + sorted(router.load(_default_engines()))
+
+@contextmanager
+def tenant_context(slug):
+    """Run a block against another tenant's databases (requires an app context)"""
+    previous = g.get('tenant', DEFAULT_TENANT)
+    db.session.remove()
+    g.tenant = slug
+    try:
+        yield
+    finally:
+        db.session.remove()
+        g.tenant = previous
+
+def _token_tenant():
+    """Tenant claim of the bearer token; routing only, jwt_required() verifies the token"""
+    header = request.headers.get('Authorization', '')
+    if not header.startswith('Bearer '):
+        return None
+    try:
+        return pyjwt.decode(header[7:], options={'verify_signature': False}).get('tenant')
+    except pyjwt.PyJWTError:
+        return None
+
+def tenant_from_request(config):
+    base_domain = (config.get('TENANT_BASE_DOMAIN') or '').lower()
+    host = request.host.split(':')[0].lower()
+    if base_domain and host.endswith('.' + base_domain):
+        subdomain = host[:-len(base_domain) - 1]
+        if subdomain and '.' not in subdomain and subdomain != 'www':
+            return subdomain
+    return _token_tenant() or request.headers.get('X-Tenant', '').strip().lower() or DEFAULT_TENANT
+
+def select_tenant():
+    slug = tenant_from_request(current_app.config)
+    if slug != DEFAULT_TENANT and router.lookup(slug, _default_engines()) is None:
+        return jsonify({'error': 'Unknown troop'}), 404
+    g.tenant = slug
+
+def token_matches_tenant(jwt_payload):
+    """A token is only valid on the tenant it was issued by"""
+    return jwt_payload.get('tenant', DEFAULT_TENANT) == current_tenant()
+
+def initialize_schema():
+    """Create or upgrade the current tenant's tables and derived data"""
+    import src.sync
+    import src.budget
+    import src.scheduling
+    from src.retention import enable_incremental_vacuum, ensure_autoincrement
+    from src.models.user import Report, ReportFact
+    from src.models.settings import Activity
+    from src.models.schedule import ActivitySlot
+
+    if not db.inspect(db.engine).get_table_names():
+        enable_incremental_vacuum(db.engine)  # lets retention give space back without a full VACUUM
+    db.create_all()
+    ensure_autoincrement()
+    src.sync.ensure_columns()
+    src.sync.ensure_indexes()
+    src.scheduling.ensure_indexes()
+    if src.scheduling.ensure_columns() or (not ActivitySlot.query.first() and Activity.query.first()):
+        src.scheduling.rebuild()
+
+    # Backfill the report data index for databases created before it existed
+    if not ReportFact.query.first() and Report.query.first():
+        ReportFact.rebuild()
+        src.budget.rebuild()
+
+    stamp_schema()
+
+def schema_version():
+    """Hash of every table, column and index the models define"""
+    digest = hashlib.sha1()
+    for bind_key, metadata in sorted(db.metadatas.items(), key=lambda item: item[0] or ''):
+        for table in sorted(metadata.tables.values(), key=lambda table: table.name):
+            digest.update(f'{bind_key}.{table.name} {sorted(table.dialect_kwargs.items())}\n'.encode())
+            for column in table.columns:
+                digest.update(f'{column.name} {type(column.type).__name__} {column.nullable} {column.primary_key}\n'.encode())
+            for index in sorted(table.indexes, key=lambda index: index.name or ''):
+                digest.update(f"{index.name} {','.join(column.name for column in index.columns)}\n".encode())
+    return digest.hexdigest()
+
+def stamped_version():
+    if not db.inspect(db.engine).has_table(SchemaStamp.__tablename__):
+        return None
+    return db.session.execute(select(SchemaStamp.version).order_by(SchemaStamp.id.desc()).limit(1)).scalar()
+
+def stamp_schema():
+    version = schema_version()
+    if stamped_version() != version:
+        db.session.add(SchemaStamp(version=version))
+        db.session.commit()
+
+def ensure_schema(force=False):
+    """initialize_schema() unless the database is stamped with the current schema; True if it ran"""
+    if not force and stamped_version() == schema_version():
+        return False
+    initialize_schema()
+    return True
+
+def create_tenant(slug, name, admin, database_uri=None, archive_uri=None):
+    """Register a troop, create its database and its first admin; admin is a dict of User fields"""
+    from src.models.user import User
+
+    slug = (slug or '').strip().lower()
+    if not SLUG_PATTERN.match(slug) or slug in (DEFAULT_TENANT, 'www'):
+        raise TenantError('Tenant slug must be 2-63 lowercase letters, digits or dashes')
+    if not name:
+        raise TenantError('Tenant name is required')
+    if not admin.get('username') or not admin.get('password'):
+        raise TenantError('Admin username and password are required')
+
+    registry = router.registry_engine(_default_engines())
+    table = Tenant.__table__
+    with registry.begin() as connection:
+        if connection.execute(select(table.c.id).where(table.c.slug == slug)).first():
+            raise TenantError('Tenant already exists')
+        connection.execute(table.insert().values(slug=slug, name=name, database_uri=database_uri,
+                                                 archive_uri=archive_uri, is_active=True))
+    router.load(_default_engines(), force=True)
+
+    with tenant_context(slug):
+        ensure_schema()  # normally already done when the tenant's engines were built
+        user = User(
+            username=admin['username'],
+            email=admin.get('email') or f"{admin['username']}@{slug}.local",
+            role='admin',
+            full_name=admin.get('full_name'),
+            is_activated=True
+        )
+        user.set_password(admin['password'])
+        db.session.add(user)
+        db.session.commit()
+
+    return Tenant.query.filter_by(slug=slug).one()
+
+def for_each_tenant(app, fn, max_workers=4):
+    """Call fn() inside each tenant's context in parallel; returns {slug: result or {'error': ...}}"""
+    with app.app_context():
+        slugs = tenant_slugs()
+
+    def run(slug):
+        with app.app_context(), tenant_context(slug):
+            try:
+                return slug, fn()
+            except Exception as e:
+                app.logger.exception('Tenant %s failed', slug)
+                return slug, {'error': str(e)}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return dict(pool.map(run, slugs))
+
+def init_tenancy(app):
+    """Route every request to its tenant's databases"""
+    app.before_request(select_tenant)